@@ -0,0 +1,93 @@
+"""A* search for graphs with known vertex locations
+
+Dijkstra's algorithm explores outward from the start equally in every direction. A*
+orders the queue by `distance so far + heuristic(vertex)` instead, where the heuristic
+estimates the remaining distance to the target. With a heuristic that never
+overestimates (admissible) and obeys the triangle inequality (consistent), the first
+time the target is popped its path is the shortest, same as Dijkstra, but far fewer
+vertices are settled since ones leading away from the target are put off.
+
+For street maps the straight-line distance to the target is such a heuristic: no road
+between two intersections can be shorter than a straight line. `graph_from_openstreetmap`
+keeps the (lon, lat) of every intersection in `graph.coordinates` and `straight_line`
+measures in the units of the graph's cost model, `graph.cost`. For travel times it is
+the time it would take on the fastest class of road.
+
+shortest_path_astar
+  * Time = O((V + E) log V) worst case, same as Dijkstra. Typically much less.
+  * Memory = O(V)
+"""
+import sys
+from heapq import heappush, heappop
+from math import hypot
+
+from cost_models import SPEEDS_KPH, haversine
+from dijkstra import Route, path_to
+
+
+def straight_line(coordinates, v_end, cost='degrees'):
+    """Returns a heuristic of the straight-line distance from any vertex to `v_end`
+
+    `cost` is the cost model of the edge weights, see `cost_models.py`.
+
+    >>> h = straight_line({'a': (0.0, 0.0), 'b': (3.0, 4.0)}, 'b')
+    >>> h('a'), h('b')
+    (5.0, 0.0)
+    >>> round(straight_line({'a': (0.0, 0.0), 'b': (0.0, 1.0)}, 'b', 'meters')('a'))
+    111195
+    """
+    x2, y2 = coordinates[v_end]
+
+    if cost == 'degrees':
+        def heuristic(v):
+            x1, y1 = coordinates[v]
+            return hypot(x1 - x2, y1 - y2)
+        return heuristic
+
+    # travel time can't be less than the distance at the fastest speed of any road
+    scale = 1.0 if cost == 'meters' else 3.6 / max(SPEEDS_KPH.values())
+
+    def heuristic(v):
+        x1, y1 = coordinates[v]
+        return haversine(x1, y1, x2, y2) * scale
+    return heuristic
+
+
+def shortest_path_astar(graph, v_start, v_end, heuristic=None):
+    """Finds the shortest path between two vertices using A*
+
+    `heuristic(vertex)` must never overestimate the distance to `v_end` and should obey
+    the triangle inequality. It defaults to `straight_line` using `graph.coordinates`
+    and `graph.cost`.
+    Returns a `Route` or None if `v_end` can't be reached from `v_start`.
+
+    >>> graph = {
+    ...     'a': [('b', 1.0), ('c', 1.0)],
+    ...     'b': [('d', 1.0)],
+    ...     'c': [('a', 1.0)],
+    ...     'd': [],
+    ... }
+    >>> coordinates = {'a': (0.0, 0.0), 'b': (1.0, 0.0), 'c': (-1.0, 0.0), 'd': (2.0, 0.0)}
+    >>> shortest_path_astar(graph, 'a', 'd', straight_line(coordinates, 'd'))
+    Route(distance=2.0, path=['a', 'b', 'd'], settled=3)
+    """
+    if heuristic is None:
+        heuristic = straight_line(graph.coordinates, v_end, graph.cost)
+
+    paths = {v_start: (0, None)}
+    settled = set()
+    queue = [(heuristic(v_start), 0, v_start)]
+    while queue:
+        _, total_dist, v_dst = heappop(queue)
+        # skip stale entries for vertices that already have their final distance
+        if v_dst in settled:
+            continue
+        settled.add(v_dst)
+        if v_dst == v_end:
+            return Route(total_dist, path_to(paths, v_start, v_end), len(settled))
+        for v_nxt, dist in graph[v_dst]:
+            _d = total_dist + dist
+            if v_nxt not in settled and paths.get(v_nxt, (sys.maxsize,))[0] > _d:
+                paths[v_nxt] = (_d, v_dst)
+                heappush(queue, (_d + heuristic(v_nxt), _d, v_nxt))
+    return None
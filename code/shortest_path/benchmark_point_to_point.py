@@ -0,0 +1,46 @@
+"""Compares A* and bidirectional Dijkstra against Dijkstra for the Ann Arbor, MI coffee shop queries
+
+Counts how many vertices each settles and times each query. See
+shortest_path_to_coffee.py for the queries themselves.
+"""
+import gzip
+from timeit import timeit
+
+from openstreetmap import graph_from_openstreetmap
+from dijkstra import shortest_paths, shortest_path
+from astar import shortest_path_astar
+from bidirectional import shortest_path_bidirectional
+
+
+graph = graph_from_openstreetmap(gzip.open('openstreetmap_ann_arbor_mi.xml.gz'))
+
+start = ('Crest Avenue', 'West Washington Street')
+cafes = {
+    'Argus': ('Second Street', 'West Liberty Street'),
+    'Big City Small World Bakery': ('Miller Avenue', 'Spring Street'),
+    'Jefferson Cakery': ('Fifth Street', 'West Jefferson Street'),
+}
+
+number = 200
+all_paths_ms = timeit(lambda: shortest_paths(graph, start), number=number) / number * 1000
+
+print(f"""
+Point-to-Point Searches vs Dijkstra for {len(graph)} intersections in Ann Arbor, MI
+
+* shortest_paths (whole graph) = {all_paths_ms:.3f} ms
+""")
+for name, cafe in cafes.items():
+    dijkstra = shortest_path(graph, start, cafe)
+    astar = shortest_path_astar(graph, start, cafe)
+    bidirectional = shortest_path_bidirectional(graph, start, cafe)
+    assert dijkstra.path == astar.path == bidirectional.path
+
+    dijkstra_ms = timeit(lambda: shortest_path(graph, start, cafe), number=number) / number * 1000
+    astar_ms = timeit(lambda: shortest_path_astar(graph, start, cafe), number=number) / number * 1000
+    bidirectional_ms = timeit(lambda: shortest_path_bidirectional(graph, start, cafe), number=number) / number * 1000
+    print(f"""{name} @ {cafe}
+
+* Dijkstra = {dijkstra.settled} settled, {dijkstra_ms:.3f} ms
+* A* = {astar.settled} settled, {astar_ms:.3f} ms
+* Bidirectional = {bidirectional.settled} settled, {bidirectional_ms:.3f} ms
+""")
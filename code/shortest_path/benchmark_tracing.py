@@ -0,0 +1,60 @@
+"""
+Helper script to measure the overhead of tracing `dijkstra.shortest_paths` and to show
+what the per-query counters look like on Ann Arbor, MI
+"""
+import gzip
+import random
+from timeit import timeit
+
+from openstreetmap import graph_from_openstreetmap
+from dijkstra import Tracer, shortest_paths
+
+
+graph = graph_from_openstreetmap(gzip.open('openstreetmap_ann_arbor_mi.xml.gz'))
+
+random.seed(0)
+sources = random.sample(list(graph), 200)
+
+traced = []
+sampled = Tracer(traced.append, every=100)
+everything = Tracer(traced.append)
+
+
+def run(tracer):
+    for v_start in sources:
+        shortest_paths(graph, v_start, tracer)
+
+
+# interleave the runs a few times and keep the best of each to smooth out noise
+times = {'none': [], 'sampled': [], 'everything': []}
+for x in range(10):
+    times['none'].append(timeit(lambda: run(None), number=1))
+    times['sampled'].append(timeit(lambda: run(sampled), number=1))
+    times['everything'].append(timeit(lambda: run(everything), number=1))
+base = min(times['none'])
+
+# the slowest query by wall time and the average of all traced ones
+slowest = max(traced, key=lambda stats: stats.seconds)
+average = {k: sum(getattr(s, k) for s in traced) / len(traced)
+           for k in ('pushes', 'pops', 'stale_pops', 'relaxations', 'settled')}
+
+
+def overhead(name):
+    return f'{min(times[name]) / len(sources) * 1000:.3f} ms per query ({min(times[name]) / base - 1:+.1%})'
+
+
+print(f"""
+Tracing shortest_paths for {len(sources)} sources in Ann Arbor, MI
+
+* No tracer = {overhead('none')}
+* Tracer(every=100) = {overhead('sampled')}
+* Tracer(every=1) = {overhead('everything')}
+
+Average of {len(traced)} traced queries
+
+* {', '.join(f'{k} = {v:.0f}' for k, v in average.items())}
+
+Slowest traced query
+
+* {slowest}
+""")
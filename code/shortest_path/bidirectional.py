@@ -0,0 +1,86 @@
+"""Bidirectional Dijkstra for point-to-point shortest paths
+
+Runs Dijkstra forward from the start over the graph and backward from the target over
+the reversed graph at the same time, always advancing whichever side has the smaller
+next distance. Each side only needs to explore about half the distance, which on road
+networks settles far fewer vertices than a one-sided search.
+
+Stopping criterion: `best` is the shortest start -> target path seen so far, through a
+vertex that both sides have reached. Once the smallest queued distances of the two
+sides add up to at least `best`, no unexplored path can be shorter and `best` is final.
+Note that the first vertex settled by both sides is NOT necessarily on the shortest path.
+
+shortest_path_bidirectional
+  * Time = O((V + E) log V) worst case, typically about half the radius on each side
+  * Memory = O(V)
+"""
+import sys
+from heapq import heappush, heappop
+
+from dijkstra import Route, path_to
+
+
+def shortest_path_bidirectional(graph, v_start, v_end, reverse=None):
+    """Finds the shortest path between two vertices searching from both ends
+
+    `reverse` is the graph with every edge reversed, see `dijkstra.reverse_graph`. It
+    defaults to `graph.reverse` made by `graph_from_openstreetmap`. Returns a `Route`,
+    with `settled` counting vertices settled by both sides, or None if `v_end` can't be
+    reached from `v_start`.
+
+    >>> from dijkstra import reverse_graph
+    >>> graph = {
+    ...     'A': [('B', 4), ('C', 2)],
+    ...     'B': [('C', 5), ('D', 10)],
+    ...     'C': [('E', 3)],
+    ...     'D': [('F', 11)],
+    ...     'E': [('D', 4)],
+    ...     'F': [],
+    ... }
+    >>> shortest_path_bidirectional(graph, 'A', 'F', reverse_graph(graph))
+    Route(distance=20, path=['A', 'C', 'E', 'D', 'F'], settled=5)
+    >>> shortest_path_bidirectional(graph, 'F', 'A', reverse_graph(graph)) is None
+    True
+    """
+    if reverse is None:
+        reverse = graph.reverse
+    if v_start == v_end:
+        return Route(0, [v_start], 1)
+
+    # forward and backward searches each keep their own paths, settled vertices and queue
+    paths = ({v_start: (0, None)}, {v_end: (0, None)})
+    settled = (set(), set())
+    queues = ([(0, v_start)], [(0, v_end)])
+    graphs = (graph, reverse)
+
+    best = sys.maxsize
+    meeting = None
+    while queues[0] and queues[1]:
+        if queues[0][0][0] + queues[1][0][0] >= best:
+            break
+
+        # advance the side that has the closer frontier
+        side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+        total_dist, v_dst = heappop(queues[side])
+        if v_dst in settled[side]:
+            continue
+        settled[side].add(v_dst)
+
+        here, there = paths[side], paths[1 - side]
+        for v_nxt, dist in graphs[side].get(v_dst, ()):
+            _d = total_dist + dist
+            if v_nxt not in settled[side] and here.get(v_nxt, (sys.maxsize,))[0] > _d:
+                here[v_nxt] = (_d, v_dst)
+                heappush(queues[side], (_d, v_nxt))
+            # a path through v_nxt is known if the other side has reached it
+            if v_nxt in there and _d + there[v_nxt][0] < best:
+                best = _d + there[v_nxt][0]
+                meeting = v_nxt
+
+    if meeting is None:
+        return None
+
+    # forward half is start -> meeting, backward half is target -> meeting so flip it
+    path = path_to(paths[0], v_start, meeting)
+    path.extend(reversed(path_to(paths[1], v_end, meeting)[:-1]))
+    return Route(best, path, len(settled[0]) + len(settled[1]))
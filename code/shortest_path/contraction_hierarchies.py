@@ -0,0 +1,323 @@
+"""Contraction hierarchies for fast, repeated shortest path queries on a static graph
+
+Dijkstra has to explore a large part of the graph for every query. Contraction
+hierarchies (CH) pay that cost once, offline, so that each query only has to explore a
+few hundred vertices at most.
+
+Preprocessing (`contract`):
+
+0. Order the vertices by importance. Unimportant vertices (dead ends, quiet side
+   streets) come first and major intersections last. The order here is picked greedily
+   by "edge difference": shortcuts a vertex would need minus edges it would remove,
+   plus how many of its neighbors were already contracted to spread contraction evenly,
+   plus its depth in the hierarchy so far to keep the hierarchy shallow. Priorities
+   are estimated with small witness searches and lazily re-checked when popped.
+
+1. Contract vertices in that order. Removing vertex `v` would break shortest paths
+   u -> v -> w, so a shortcut edge u -> w is added unless a "witness" path that is at
+   least as short avoids `v`. Witness searches are limited Dijkstra searches that stop
+   once every w is settled.
+
+2. Every edge left on a vertex when it is contracted points to a more important vertex.
+   These are kept as the "upward" graph (and its reverse, the "downward" graph).
+
+Vertices are numbered by rank during preprocessing, so the hierarchy and queries work
+on integers and lists instead of hashing (street, street) tuples.
+
+Query (`shortest_path_ch`): a bidirectional Dijkstra where both sides only follow
+edges upward. The shortest path goes up from the start and then down to the target,
+so the two searches meet at its most important vertex. "Stall-on-demand" skips
+expanding a vertex when a more important vertex that was already reached has a
+shorter path to it, since no shortest path goes through it then. Shortcuts in the
+resulting path are unpacked in to the original vertices via the vertex each shortcut
+skipped.
+
+`save` and `load` persist a `Hierarchy` with pickle so preprocessing only happens once.
+
+Run with `python contraction_hierarchies.py` to preprocess Ann Arbor, MI and compare
+query times against Dijkstra.
+"""
+import pickle
+import sys
+from collections import namedtuple
+from heapq import heappush, heappop
+
+from dijkstra import Route
+
+
+# rank = contraction order of each vertex and vertices = every vertex by rank. up/down
+# = upward edges out of/in to each rank as (rank, dist) and middle = the rank skipped
+# by each shortcut, keyed by (from rank, to rank)
+Hierarchy = namedtuple('Hierarchy', 'rank up down middle vertices')
+
+
+def _witness_distances(out_edges, v_src, v_skip, targets, max_dist, max_settled):
+    """Limited Dijkstra from `v_src` that ignores `v_skip` and stops past `max_dist` or
+    once all `targets` are settled"""
+    distances = {v_src: 0}
+    settled = 0
+    remaining = len(targets)
+    queue = [(0, v_src)]
+    while queue and settled < max_settled:
+        total_dist, v_dst = heappop(queue)
+        if total_dist > distances[v_dst]:
+            continue
+        if total_dist > max_dist:
+            break
+        settled += 1
+        if v_dst in targets:
+            remaining -= 1
+            if not remaining:
+                break
+        for v_nxt, dist in out_edges[v_dst].items():
+            if v_nxt == v_skip:
+                continue
+            _d = total_dist + dist
+            if _d < distances.get(v_nxt, sys.maxsize):
+                distances[v_nxt] = _d
+                heappush(queue, (_d, v_nxt))
+    return distances
+
+def _shortcuts(out_edges, in_edges, v, max_settled):
+    """Lists the (u, w, dist) shortcuts needed to contract `v`"""
+    shortcuts = []
+    for u, dist_in in in_edges[v].items():
+        targets = {w: dist_in + dist_out for w, dist_out in out_edges[v].items() if w != u}
+        if not targets:
+            continue
+        witnesses = _witness_distances(out_edges, u, v, targets, max(targets.values()), max_settled)
+        for w, via in targets.items():
+            if witnesses.get(w, sys.maxsize) > via:
+                shortcuts.append((u, w, via))
+    return shortcuts
+
+def _priority(out_edges, in_edges, contracted_neighbors, depth, v, max_settled):
+    """Edge difference plus contracted neighbors and depth, smaller is contracted sooner"""
+    shortcuts = _shortcuts(out_edges, in_edges, v, max_settled)
+    removed = len(out_edges[v]) + len(in_edges[v])
+    return len(shortcuts) - removed + 2 * contracted_neighbors[v] + depth[v]
+
+def contract(graph, max_settled=500, estimate_settled=50):
+    """Builds a contraction hierarchy for the graph
+
+    `max_settled` limits each witness search when contracting a vertex. Smaller is
+    faster to preprocess but may add shortcuts that aren't needed, which only makes
+    queries a little slower. `estimate_settled` is the same limit for the far more
+    frequent witness searches that only estimate priorities.
+
+    >>> graph = {
+    ...     'A': [('B', 4), ('C', 2)],
+    ...     'B': [('C', 5), ('D', 10)],
+    ...     'C': [('E', 3)],
+    ...     'D': [('F', 11)],
+    ...     'E': [('D', 4)],
+    ...     'F': [],
+    ... }
+    >>> hierarchy = contract(graph)
+    >>> shortest_path_ch(hierarchy, 'A', 'F')[:2]
+    (20, ['A', 'C', 'E', 'D', 'F'])
+    >>> shortest_path_ch(hierarchy, 'F', 'A') is None
+    True
+    """
+    # integer IDs for every vertex, they are cheaper to hash than (street, street) tuples
+    ids = {}
+    for v_src, edges in graph.items():
+        ids.setdefault(v_src, len(ids))
+        for v_dst, _ in edges:
+            ids.setdefault(v_dst, len(ids))
+    vertices = list(ids)
+
+    # working copy of the graph, the shortest of any parallel edges is kept
+    out_edges = [{} for v in vertices]
+    in_edges = [{} for v in vertices]
+    for v_src, edges in graph.items():
+        v_src = ids[v_src]
+        for v_dst, dist in edges:
+            v_dst = ids[v_dst]
+            if v_src == v_dst:
+                continue
+            if dist < out_edges[v_src].get(v_dst, sys.maxsize):
+                out_edges[v_src][v_dst] = dist
+                in_edges[v_dst][v_src] = dist
+
+    contracted_neighbors = [0] * len(vertices)
+    depth = [0] * len(vertices)
+    queue = []
+    for v in range(len(vertices)):
+        heappush(queue, (_priority(out_edges, in_edges, contracted_neighbors, depth, v, estimate_settled), v))
+
+    order = []
+    up = {}
+    down = {}
+    middle = {}
+    while queue:
+        _, v = heappop(queue)
+
+        # priorities go stale as neighbors are contracted, lazily re-check the top one
+        priority = _priority(out_edges, in_edges, contracted_neighbors, depth, v, estimate_settled)
+        if queue and priority > queue[0][0]:
+            heappush(queue, (priority, v))
+            continue
+
+        for u, w, dist in _shortcuts(out_edges, in_edges, v, max_settled):
+            if dist < out_edges[u].get(w, sys.maxsize):
+                out_edges[u][w] = dist
+                in_edges[w][u] = dist
+                middle[(u, w)] = v
+
+        # all remaining edges lead to vertices contracted later, aka more important
+        order.append(v)
+        up[v] = list(out_edges[v].items())
+        down[v] = list(in_edges[v].items())
+        for w in out_edges[v]:
+            del in_edges[w][v]
+        for u in in_edges[v]:
+            del out_edges[u][v]
+        for w in out_edges[v].keys() | in_edges[v].keys():
+            contracted_neighbors[w] += 1
+            depth[w] = max(depth[w], depth[v] + 1)
+        out_edges[v] = in_edges[v] = None
+
+    # renumber everything from IDs to ranks
+    rank = [0] * len(order)
+    for r, v in enumerate(order):
+        rank[v] = r
+    return Hierarchy(
+        {vertices[v]: rank[v] for v in order},
+        [[(rank[w], dist) for w, dist in up[v]] for v in order],
+        [[(rank[u], dist) for u, dist in down[v]] for v in order],
+        {(rank[u], rank[w]): rank[v] for (u, w), v in middle.items()},
+        [vertices[v] for v in order])
+
+def _unpack(middle, path):
+    """Replaces every shortcut in the path with the original vertices it skipped"""
+    unpacked = [path[0]]
+    # edges still to unpack, in reverse order so the next one is on top
+    edges = list(zip(path[-2::-1], path[:0:-1]))
+    while edges:
+        v_src, v_dst = edges.pop()
+        v_mid = middle.get((v_src, v_dst))
+        if v_mid is None:
+            unpacked.append(v_dst)
+        else:
+            edges.append((v_mid, v_dst))
+            edges.append((v_src, v_mid))
+    return unpacked
+
+def shortest_path_ch(hierarchy, v_start, v_end):
+    """Finds the shortest path between two vertices using a contraction hierarchy
+
+    Returns a `Route` with the unpacked path, or None if `v_end` can't be reached.
+    `settled` counts vertices settled by both upward searches.
+    """
+    rank, up, down, middle, vertices = hierarchy
+    r_start, r_end = rank.get(v_start), rank.get(v_end)
+    if r_start is None or r_end is None:
+        return None
+
+    # forward search over `up` from the start and backward search over `down` from the target
+    n = len(vertices)
+    forward, backward = [sys.maxsize] * n, [sys.maxsize] * n
+    forward[r_start] = backward[r_end] = 0
+    parents = ({r_start: None}, {r_end: None})
+    queues = ([(0, r_start)], [(0, r_end)])
+
+    settled = 0
+    best = sys.maxsize
+    meeting = None
+    while queues[0] or queues[1]:
+        if queues[0] and (not queues[1] or queues[0][0][0] <= queues[1][0][0]):
+            queue, here, there, parent, edges, stall_edges = queues[0], forward, backward, parents[0], up, down
+        else:
+            queue, here, there, parent, edges, stall_edges = queues[1], backward, forward, parents[1], down, up
+        total_dist, v_dst = heappop(queue)
+        # each side can stop on its own once it can't improve on the best path
+        if total_dist >= best:
+            queue.clear()
+            continue
+        if total_dist > here[v_dst]:
+            continue
+        settled += 1
+
+        if total_dist + there[v_dst] < best:
+            best = total_dist + there[v_dst]
+            meeting = v_dst
+
+        # stall-on-demand, a more important vertex already reached has a shorter path here
+        stalled = False
+        for v_prv, dist in stall_edges[v_dst]:
+            if here[v_prv] + dist < total_dist:
+                stalled = True
+                break
+        if stalled:
+            continue
+
+        for v_nxt, dist in edges[v_dst]:
+            _d = total_dist + dist
+            if here[v_nxt] > _d:
+                here[v_nxt] = _d
+                parent[v_nxt] = v_dst
+                heappush(queue, (_d, v_nxt))
+
+    if meeting is None:
+        return None
+
+    # start -> meeting is forward, target -> meeting is backward so it gets flipped
+    path = [meeting]
+    while path[-1] != r_start:
+        path.append(parents[0][path[-1]])
+    path.reverse()
+    while path[-1] != r_end:
+        path.append(parents[1][path[-1]])
+    return Route(best, [vertices[r] for r in _unpack(middle, path)], settled)
+
+def save(hierarchy, path):
+    """Writes a preprocessed hierarchy to disk"""
+    with open(path, 'wb') as f:
+        pickle.dump(tuple(hierarchy), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def load(path):
+    """Reads a hierarchy written by `save`"""
+    with open(path, 'rb') as f:
+        return Hierarchy(*pickle.load(f))
+
+
+if __name__ == '__main__':
+    import gzip
+    import random
+    import time
+
+    from openstreetmap import graph_from_openstreetmap
+    from dijkstra import shortest_path
+
+    graph = graph_from_openstreetmap(gzip.open('openstreetmap_ann_arbor_mi.xml.gz'))
+
+    start = time.perf_counter()
+    hierarchy = contract(graph)
+    preprocess_seconds = time.perf_counter() - start
+
+    random.seed(0)
+    vertices = list(graph)
+    queries = [tuple(random.sample(vertices, 2)) for x in range(1000)]
+
+    start = time.perf_counter()
+    dijkstra = [shortest_path(graph, v_start, v_end) for v_start, v_end in queries]
+    dijkstra_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+    start = time.perf_counter()
+    ch = [shortest_path_ch(hierarchy, v_start, v_end) for v_start, v_end in queries]
+    ch_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+    for a, b in zip(dijkstra, ch):
+        assert (a is None) == (b is None)
+        assert a is None or abs(a.distance - b.distance) < 1e-9
+
+    edges = sum(len(e) for e in graph.values())
+    print(f"""
+Contraction Hierarchies for {len(graph)} intersections and {edges} roads in Ann Arbor, MI
+
+* Preprocessing = {preprocess_seconds:.2f} s
+* Shortcuts = {len(hierarchy.middle)}
+* Dijkstra = {dijkstra_ms:.3f} ms per query, {sum(r.settled for r in dijkstra if r) / len(queries):.0f} settled
+* Contraction hierarchies = {ch_ms:.3f} ms per query, {sum(r.settled for r in ch if r) / len(queries):.0f} settled
+""")
@@ -0,0 +1,127 @@
+"""Edge weights for road graphs: straight-line degrees, meters or travel time
+
+`graph_from_openstreetmap` collects every edge first and then computes all weights in
+one batch over coordinate arrays with `edge_weights`. NumPy is an optional dependency
+(see requirements.txt) and is used when it is installed, otherwise the same formulas run
+in a plain Python loop.
+
+Cost models:
+
+* `degrees` = straight-line distance on raw (lon, lat). The original weights. Cheap, but
+  a degree of longitude is shorter than a degree of latitude away from the equator.
+* `meters` = great-circle (haversine) distance in meters
+* `seconds` = travel time, meters divided by the speed of the road's `highway` class,
+  see `SPEEDS_KPH`
+"""
+from array import array
+from math import asin, cos, radians, sin, sqrt
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+COSTS = ('degrees', 'meters', 'seconds')
+
+# mean radius of the Earth
+EARTH_RADIUS_METERS = 6371008.8
+
+# typical speeds per OpenStreetMap `highway` class, `*_link` ramps use their road's speed
+SPEEDS_KPH = {
+    'motorway': 100,
+    'trunk': 80,
+    'primary': 60,
+    'secondary': 50,
+    'tertiary': 40,
+    'unclassified': 30,
+    'residential': 30,
+    'living_street': 10,
+    'service': 15,
+    'track': 15,
+    'cycleway': 15,
+    'pedestrian': 5,
+    'footway': 5,
+    'path': 5,
+    'steps': 3,
+}
+DEFAULT_SPEED_KPH = 30
+
+
+def speed(highway):
+    """Speed in meters per second for a `highway` class
+
+    >>> speed('primary'), speed('primary_link'), speed('unknown') == speed('residential')
+    (16.666666666666668, 16.666666666666668, True)
+    """
+    if highway and highway.endswith('_link'):
+        highway = highway[:-len('_link')]
+    return SPEEDS_KPH.get(highway, DEFAULT_SPEED_KPH) / 3.6
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """Great-circle distance in meters between two (lon, lat) in degrees
+
+    >>> round(haversine(-83.7430, 42.2808, -83.7430, 42.2908))
+    1112
+    """
+    lon1, lat1, lon2, lat2 = radians(lon1), radians(lat1), radians(lon2), radians(lat2)
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * asin(sqrt(a))
+
+
+def edge_weights(lon1, lat1, lon2, lat2, cost='degrees', speeds=None, use_numpy=True):
+    """Weights of every edge from (lon1[i], lat1[i]) to (lon2[i], lat2[i])
+
+    The inputs are equal length sequences, ideally `array('d')`. `speeds` is meters per
+    second for each edge and is required for `seconds`. Returns an `array('d')`.
+
+    >>> lon1, lat1 = array('d', [0.0, -83.743]), array('d', [0.0, 42.2808])
+    >>> lon2, lat2 = array('d', [3.0, -83.743]), array('d', [4.0, 42.2908])
+    >>> [round(w, 6) for w in edge_weights(lon1, lat1, lon2, lat2)]
+    [5.0, 0.01]
+    >>> [round(w) for w in edge_weights(lon1, lat1, lon2, lat2, 'meters')]
+    [555813, 1112]
+    >>> [round(w) for w in edge_weights(lon1, lat1, lon2, lat2, 'seconds', [10.0, 5.0])]
+    [55581, 222]
+
+    Both paths give the same weights, NumPy only makes the batch faster
+
+    >>> speeds = [10.0, 5.0]
+    >>> numpy is None or all(
+    ...     all(abs(a - b) <= 1e-9 * max(1.0, b) for a, b in zip(
+    ...         edge_weights(lon1, lat1, lon2, lat2, cost, speeds),
+    ...         edge_weights(lon1, lat1, lon2, lat2, cost, speeds, use_numpy=False)))
+    ...     for cost in COSTS)
+    True
+    """
+    if cost not in COSTS:
+        raise ValueError(f'Unknown cost model: {cost}, expected one of {COSTS}')
+    if cost == 'seconds' and speeds is None:
+        raise ValueError('Travel time needs the speed of every edge')
+
+    if numpy is not None and use_numpy:
+        # an array('d') is shared with NumPy as is, anything else is converted once
+        lon1, lat1, lon2, lat2 = (numpy.frombuffer(a, dtype=numpy.float64)
+                                  if isinstance(a, array) and a.typecode == 'd'
+                                  else numpy.asarray(a, dtype=numpy.float64)
+                                  for a in (lon1, lat1, lon2, lat2))
+        if cost == 'degrees':
+            batch = numpy.sqrt((lon1 - lon2) ** 2 + (lat1 - lat2) ** 2)
+        else:
+            lon1, lat1, lon2, lat2 = (numpy.radians(a) for a in (lon1, lat1, lon2, lat2))
+            a = numpy.sin((lat2 - lat1) / 2) ** 2 + numpy.cos(lat1) * numpy.cos(lat2) * numpy.sin((lon2 - lon1) / 2) ** 2
+            batch = 2 * EARTH_RADIUS_METERS * numpy.arcsin(numpy.sqrt(a))
+            if cost == 'seconds':
+                batch /= numpy.asarray(speeds, dtype=numpy.float64)
+        weights = array('d')
+        weights.frombytes(batch.tobytes())
+        return weights
+
+    if cost == 'degrees':
+        return array('d', (sqrt(pow(x1 - x2, 2) + pow(y1 - y2, 2))
+                           for x1, y1, x2, y2 in zip(lon1, lat1, lon2, lat2)))
+    weights = array('d', map(haversine, lon1, lat1, lon2, lat2))
+    if cost == 'seconds':
+        weights = array('d', (w / s for w, s in zip(weights, speeds)))
+    return weights
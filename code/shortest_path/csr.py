@@ -0,0 +1,209 @@
+"""Compressed sparse row (CSR) graphs and Dijkstra over them
+
+The dict graph from `graph_from_openstreetmap` keeps a list of (vertex, dist) tuples per
+vertex and each vertex is a tuple of two street names. That is a few hundred bytes per
+edge, and every relaxation hashes a tuple of strings to look up its distance.
+
+CSR numbers the vertices 0..V-1 and stores all edges in three flat arrays:
+
+* `offsets` = V + 1 entries, edges of vertex `v` are at `offsets[v]:offsets[v + 1]`
+* `targets` = E entries, the vertex ID each edge points to
+* `weights` = E entries, the distance of each edge
+
+`names[v]` maps an ID back to the original vertex and `ids[name]` goes the other way.
+Distances and parents during a search are arrays indexed by ID too, so the search never
+hashes anything.
+
+to_csr
+  * Time = O(V + E)
+  * Memory = 4 bytes per vertex + 12 bytes per edge, plus the name table
+
+shortest_paths_csr / shortest_path_csr = Dijkstra's algorithm, same as `dijkstra.py`
+"""
+import sys
+from array import array
+from collections import namedtuple
+from heapq import heappush, heappop
+
+from dijkstra import Route
+
+
+CSRGraph = namedtuple('CSRGraph', 'offsets targets weights names ids')
+
+
+def to_csr(graph):
+    """Converts a dict of vertex -> [(vertex, dist), ...] to a `CSRGraph`
+
+    IDs are assigned in the graph's key order, then to any vertices that only appear
+    as edge targets.
+
+    >>> csr = to_csr({'A': [('B', 4), ('C', 2)], 'B': [('C', 5)], 'C': []})
+    >>> csr.offsets.tolist(), csr.targets.tolist(), csr.weights.tolist()
+    ([0, 2, 3, 3], [1, 2, 2], [4.0, 2.0, 5.0])
+    >>> csr.names, csr.ids['C']
+    (['A', 'B', 'C'], 2)
+    """
+    names = list(graph)
+    ids = {name: i for i, name in enumerate(names)}
+    for edges in graph.values():
+        for v_dst, _ in edges:
+            if v_dst not in ids:
+                ids[v_dst] = len(names)
+                names.append(v_dst)
+
+    offsets = array('I', [0])
+    targets = array('I')
+    weights = array('d')
+    for name in names:
+        for v_dst, dist in graph.get(name, ()):
+            targets.append(ids[v_dst])
+            weights.append(dist)
+        offsets.append(len(targets))
+    return CSRGraph(offsets, targets, weights, names, ids)
+
+
+def shortest_paths_csr(csr, v_start):
+    """Dijkstra from vertex ID `v_start` to every other vertex
+
+    Returns (distances, parents) arrays indexed by vertex ID. Unreachable vertices have
+    an infinite distance and every vertex without a parent has -1.
+    """
+    offsets, targets, weights = csr.offsets, csr.targets, csr.weights
+    distances = array('d', [float('inf')]) * (len(offsets) - 1)
+    parents = array('l', [-1]) * (len(offsets) - 1)
+    distances[v_start] = 0
+    queue = [(0, v_start)]
+    while queue:
+        total_dist, v_dst = heappop(queue)
+        # skip stale entries, a shorter path to this vertex was already found
+        if total_dist > distances[v_dst]:
+            continue
+        start, end = offsets[v_dst], offsets[v_dst + 1]
+        for v_nxt, dist in zip(targets[start:end], weights[start:end]):
+            _d = total_dist + dist
+            if distances[v_nxt] > _d:
+                distances[v_nxt] = _d
+                parents[v_nxt] = v_dst
+                heappush(queue, (_d, v_nxt))
+    return distances, parents
+
+
+def shortest_path_csr(csr, v_start, v_end):
+    """Finds the shortest path between two vertex IDs, stopping once the target is settled
+
+    Returns a `Route` whose path is vertex IDs, see `csr.names`, or None if `v_end`
+    can't be reached from `v_start`.
+
+    >>> graph = {
+    ...     'A': [('B', 4), ('C', 2)],
+    ...     'B': [('C', 5), ('D', 10)],
+    ...     'C': [('E', 3)],
+    ...     'D': [('F', 11)],
+    ...     'E': [('D', 4)],
+    ...     'F': [],
+    ... }
+    >>> csr = to_csr(graph)
+    >>> route = shortest_path_csr(csr, csr.ids['A'], csr.ids['F'])
+    >>> route.distance, [csr.names[v] for v in route.path], route.settled
+    (20.0, ['A', 'C', 'E', 'D', 'F'], 6)
+    >>> shortest_path_csr(csr, csr.ids['F'], csr.ids['A']) is None
+    True
+    """
+    offsets, targets, weights = csr.offsets, csr.targets, csr.weights
+    distances = array('d', [float('inf')]) * (len(offsets) - 1)
+    parents = array('l', [-1]) * (len(offsets) - 1)
+    settled = bytearray(len(offsets) - 1)
+    num_settled = 0
+    distances[v_start] = 0
+    queue = [(0, v_start)]
+    while queue:
+        total_dist, v_dst = heappop(queue)
+        # skip stale entries for vertices that already have their final distance
+        if settled[v_dst]:
+            continue
+        settled[v_dst] = 1
+        num_settled += 1
+        if v_dst == v_end:
+            return Route(total_dist, path_to_csr(parents, v_start, v_end), num_settled)
+        start, end = offsets[v_dst], offsets[v_dst + 1]
+        for v_nxt, dist in zip(targets[start:end], weights[start:end]):
+            _d = total_dist + dist
+            if distances[v_nxt] > _d:
+                distances[v_nxt] = _d
+                parents[v_nxt] = v_dst
+                heappush(queue, (_d, v_nxt))
+    return None
+
+
+def path_to_csr(parents, v_src, v_dst):
+    """Follows `parents` backwards from `v_dst` and returns the vertex IDs from `v_src` onward"""
+    path = [v_dst]
+    while v_dst != v_src:
+        v_dst = parents[v_dst]
+        path.append(v_dst)
+    path.reverse()
+    return path
+
+
+def _dict_graph_bytes(graph):
+    """Rough size of the dict graph, not counting the vertex names it shares with CSR"""
+    size = sys.getsizeof(graph)
+    for edges in graph.values():
+        size += sys.getsizeof(edges)
+        size += sum(sys.getsizeof(edge) + sys.getsizeof(edge[1]) for edge in edges)
+    return size
+
+
+def _csr_bytes(csr):
+    """Rough size of the CSR arrays and the ID table, not counting the vertex names"""
+    arrays = sum(a.itemsize * len(a) for a in (csr.offsets, csr.targets, csr.weights))
+    return arrays + sys.getsizeof(csr.names) + sys.getsizeof(csr.ids)
+
+
+if __name__ == '__main__':
+    import gzip
+    import random
+    import time
+
+    from openstreetmap import graph_from_openstreetmap
+    from dijkstra import shortest_paths, shortest_path
+
+    graph = graph_from_openstreetmap(gzip.open('openstreetmap_ann_arbor_mi.xml.gz'))
+
+    start = time.perf_counter()
+    csr = to_csr(graph)
+    convert_ms = (time.perf_counter() - start) * 1000
+
+    random.seed(0)
+    vertices = list(graph)
+    sources = random.sample(vertices, 100)
+    queries = [tuple(random.sample(vertices, 2)) for x in range(1000)]
+
+    def per_call_ms(f, args):
+        start = time.perf_counter()
+        results = [f(*a) for a in args]
+        return results, (time.perf_counter() - start) / len(args) * 1000
+
+    trees, dict_tree_ms = per_call_ms(shortest_paths, [(graph, v) for v in sources])
+    csr_trees, csr_tree_ms = per_call_ms(shortest_paths_csr, [(csr, csr.ids[v]) for v in sources])
+    routes, dict_route_ms = per_call_ms(shortest_path, [(graph, a, b) for a, b in queries])
+    csr_routes, csr_route_ms = per_call_ms(
+        shortest_path_csr, [(csr, csr.ids[a], csr.ids[b]) for a, b in queries])
+
+    # both representations must agree before timing means anything
+    for v_start, paths, (distances, _) in zip(sources, trees, csr_trees):
+        for v, (d, _) in paths.items():
+            assert v == v_start or abs(distances[csr.ids[v]] - d) < 1e-9
+    for a, b in zip(routes, csr_routes):
+        assert (a is None) == (b is None)
+        assert a is None or abs(a.distance - b.distance) < 1e-9
+
+    edges = len(csr.targets)
+    print(f"""
+CSR vs Dict Graph for {len(graph)} intersections and {edges} roads in Ann Arbor, MI
+
+* to_csr = {convert_ms:.1f} ms
+* Memory = {_dict_graph_bytes(graph) / edges:.0f} bytes per edge vs {_csr_bytes(csr) / edges:.0f} bytes per edge
+* shortest_paths (whole graph) = {dict_tree_ms:.3f} ms vs {csr_tree_ms:.3f} ms
+* shortest_path (point-to-point) = {dict_route_ms:.3f} ms vs {csr_route_ms:.3f} ms
+""")
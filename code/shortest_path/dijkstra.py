@@ -10,12 +10,26 @@ shortest_paths = Dijkstra's algorithm
   * Time = O((V + E) log V)
     * (V + E) = explores each vertex and edge once
     * log V = timing of heapsort push/pop
+  * The priority queue is pluggable, `heapq` by default, see `priority_queues.py`
   * Memory
     * size of graph -- assume not related but O(V + E)
     * O(V) = map of shortest path to vertex
 
+* shortest_path = Dijkstra's algorithm for one source and one target
+  * Stops as soon as the target is popped from the queue, which on average settles
+    far fewer vertices than `shortest_paths`
+  * Returns the distance and path directly as a `Route`
+
 * print_path = Utility method to show the path. O(N) bound memory use
 
+* reverse_graph = Same graph with every edge pointing the other way. O(V + E)
+
+* Tracer = Optional per-query counters for `shortest_paths` and `shortest_path`: heap
+  pushes, pops, stale pops, relaxations, settled vertices and wall time. Only every
+  `every`-th query is traced. Both run the same loop, traced queries pass it counting
+  versions of the queue's push and pop and work out the rest afterwards, so leaving a
+  tracer on costs one `is not None` check per untraced query.
+
 The graph is in the following example format:
 
 ```
@@ -36,28 +50,226 @@ graph = {
 ```
 """
 import sys
+import time
+from collections import defaultdict, namedtuple
 from heapq import heappush, heappop
 
 
-def shortest_paths(graph, v_start):
-    paths = {}
-    queue = [(0, v_start)]
+# result of a point-to-point query. `settled` is how many vertices were popped as final
+Route = namedtuple('Route', 'distance path settled')
+
+
+class QueryStats:
+    """Work done by one traced query
+
+    `relaxations` counts every edge looked at and `pushes` the ones that improved a
+    distance, plus the start. `stale_pops` are queue entries skipped because a shorter
+    path to their vertex was already found.
+    """
+    __slots__ = 'source', 'target', 'pushes', 'pops', 'stale_pops', 'relaxations', 'settled', 'seconds'
+
+    def __init__(self, source, target=None):
+        self.source = source
+        self.target = target
+        self.pushes = self.pops = self.stale_pops = self.relaxations = self.settled = 0
+        self.seconds = 0.0
+
+    def counting(self, push, pop):
+        """Wraps a queue's `push(queue, entry)` and `pop(queue)` so they count in these stats"""
+        def counted_push(queue, entry):
+            self.pushes += 1
+            push(queue, entry)
+
+        def counted_pop(queue):
+            self.pops += 1
+            return pop(queue)
+        return counted_push, counted_pop
+
+    def __repr__(self):
+        return 'QueryStats(' + ', '.join(f'{k}={getattr(self, k)!r}' for k in self.__slots__) + ')'
+
+
+class Tracer:
+    """Samples queries for instrumentation and passes their `QueryStats` to `callback`
+
+    Every `every`-th query is traced, starting with the first.
+
+    >>> graph = {'A': [('B', 4), ('C', 2)], 'B': [('C', 5)], 'C': [('B', 1)]}
+    >>> traced = []
+    >>> tracer = Tracer(traced.append, every=2)
+    >>> for x in range(3):
+    ...     _ = shortest_paths(graph, 'A', tracer)
+    >>> len(traced), tracer.queries
+    (2, 3)
+    >>> stats = traced[0]
+    >>> stats.pushes, stats.pops, stats.stale_pops, stats.relaxations, stats.settled
+    (4, 4, 1, 4, 3)
+
+    A cycle back to the start doesn't settle it twice
+
+    >>> shortest_paths({'A': [('B', 1)], 'B': [('A', 1)]}, 'A', Tracer(print)) # doctest: +ELLIPSIS
+    QueryStats(source='A', target=None, pushes=2, pops=2, stale_pops=0, relaxations=2, settled=2, seconds=...)
+    {'B': (1, 'A')}
+    >>> shortest_path(graph, 'A', 'B', Tracer(print)) # doctest: +ELLIPSIS
+    QueryStats(source='A', target='B', pushes=4, pops=3, stale_pops=0, relaxations=3, settled=3, seconds=...)
+    Route(distance=3, path=['A', 'C', 'B'], settled=3)
+    """
+    __slots__ = 'callback', 'every', 'queries'
+
+    def __init__(self, callback, every=1):
+        self.callback = callback
+        self.every = every
+        self.queries = 0
+
+    def start(self, source, target=None):
+        """Returns new `QueryStats` if this query is sampled, otherwise None"""
+        self.queries += 1
+        if (self.queries - 1) % self.every:
+            return None
+        return QueryStats(source, target)
+
+    def finish(self, stats):
+        self.callback(stats)
+
+
+def shortest_paths(graph, v_start, tracer=None, queue=None):
+    """Finds the shortest path from `v_start` to every vertex it can reach
+
+    Returns `{vertex: (distance, previous vertex)}`, without `v_start` itself. `queue` is
+    an optional empty priority queue from `priority_queues.py`, `heapq` is used if None.
+
+    >>> from priority_queues import IndexedHeap
+    >>> graph = {'A': [('B', 4), ('C', 2)], 'B': [('A', 1)], 'C': [('B', 1)]}
+    >>> shortest_paths(graph, 'A')
+    {'B': (3, 'C'), 'C': (2, 'A')}
+    >>> shortest_paths(graph, 'A', queue=IndexedHeap())
+    {'B': (3, 'C'), 'C': (2, 'A')}
+    """
+    if queue is None:
+        queue, push, pop = [], heappush, heappop
+    else:
+        push, pop = type(queue).push, type(queue).pop
+    if tracer is not None:
+        stats = tracer.start(v_start)
+        if stats is not None:
+            started = time.perf_counter()
+            paths = _shortest_paths(graph, v_start, queue, *stats.counting(push, pop))
+            # only the search is timed, not working out the counters below
+            stats.seconds = time.perf_counter() - started
+            # every reachable vertex is settled and expanded once, the start included
+            stats.settled = len(paths) + 1
+            stats.stale_pops = stats.pops - stats.settled
+            stats.relaxations = len(graph[v_start]) + sum(len(graph[v]) for v in paths)
+            tracer.finish(stats)
+            return paths
+    return _shortest_paths(graph, v_start, queue, push, pop)
+
+
+def _shortest_paths(graph, v_start, queue, push, pop):
+    """Loop of `shortest_paths` over an empty queue and its `push(queue, entry)` and `pop(queue)`"""
+    # the start is seeded so that a cycle back to it never settles it again
+    paths = {v_start: (0, None)}
+    push(queue, (0, v_start))
     while queue:
-        total_dist, v_dst = heappop(queue)
+        total_dist, v_dst = pop(queue)
+        # skip stale entries, a shorter path to this vertex was already found
+        if total_dist > paths[v_dst][0]:
+            continue
         for v_nxt, dist in graph[v_dst]:
             _d = total_dist + dist
             if paths.get(v_nxt, (sys.maxsize,))[0] > _d:
                 paths[v_nxt] = (_d, v_dst)
-                heappush(queue, (_d, v_nxt))
+                push(queue, (_d, v_nxt))
+    # the tree is only the vertices reached from the start
+    del paths[v_start]
     return paths
 
 
-def print_path(paths, v_src, v_dst):
+def shortest_path(graph, v_start, v_end, tracer=None):
+    """Finds the shortest path between two vertices, stopping once the target is settled
+
+    Returns a `Route` or None if `v_end` can't be reached from `v_start`. `tracer` is an
+    optional `Tracer`.
+
+    >>> graph = {
+    ...     'A': [('B', 4), ('C', 2)],
+    ...     'B': [('C', 5), ('D', 10)],
+    ...     'C': [('E', 3)],
+    ...     'D': [('F', 11)],
+    ...     'E': [('D', 4)],
+    ...     'F': [],
+    ... }
+    >>> shortest_path(graph, 'A', 'F')
+    Route(distance=20, path=['A', 'C', 'E', 'D', 'F'], settled=6)
+    >>> shortest_path(graph, 'A', 'E')
+    Route(distance=5, path=['A', 'C', 'E'], settled=4)
+    >>> shortest_path(graph, 'A', 'A')
+    Route(distance=0, path=['A'], settled=1)
+    >>> shortest_path(graph, 'F', 'A') is None
+    True
+    """
+    if tracer is not None:
+        stats = tracer.start(v_start, v_end)
+        if stats is not None:
+            started = time.perf_counter()
+            route, settled = _shortest_path(graph, v_start, v_end, *stats.counting(heappush, heappop))
+            stats.seconds = time.perf_counter() - started
+            stats.settled = len(settled)
+            stats.stale_pops = stats.pops - stats.settled
+            # the target is settled but its edges are never looked at
+            stats.relaxations = sum(len(graph[v]) for v in settled if v != v_end)
+            tracer.finish(stats)
+            return route
+    return _shortest_path(graph, v_start, v_end, heappush, heappop)[0]
+
+
+def _shortest_path(graph, v_start, v_end, push, pop):
+    """Loop of `shortest_path`, returns the `Route` or None and the settled vertices"""
+    paths = {v_start: (0, None)}
+    settled = set()
+    queue = []
+    push(queue, (0, v_start))
+    while queue:
+        total_dist, v_dst = pop(queue)
+        # skip stale entries for vertices that already have their final distance
+        if v_dst in settled:
+            continue
+        settled.add(v_dst)
+        if v_dst == v_end:
+            return Route(total_dist, path_to(paths, v_start, v_end), len(settled)), settled
+        for v_nxt, dist in graph[v_dst]:
+            _d = total_dist + dist
+            if v_nxt not in settled and paths.get(v_nxt, (sys.maxsize,))[0] > _d:
+                paths[v_nxt] = (_d, v_dst)
+                push(queue, (_d, v_nxt))
+    return None, settled
+
+
+def path_to(paths, v_src, v_dst):
+    """Follows `paths` backwards from `v_dst` and returns the vertices from `v_src` onward"""
     path = [v_dst]
     current = v_dst
     while current != v_src:
         _, _p = paths[current]
         path.append(_p)
         current = _p
-    for step in reversed(path):
+    path.reverse()
+    return path
+
+
+def print_path(paths, v_src, v_dst):
+    for step in path_to(paths, v_src, v_dst):
         print(step)
+
+
+def reverse_graph(graph):
+    """Returns the graph with every edge reversed, e.g. to search backwards from a target
+
+    >>> dict(reverse_graph({'A': [('B', 4), ('C', 2)], 'B': [('C', 5)], 'C': []}))
+    {'B': [('A', 4)], 'C': [('A', 2), ('B', 5)]}
+    """
+    reverse = defaultdict(list)
+    for v_src, edges in graph.items():
+        for v_dst, dist in edges:
+            reverse[v_dst].append((v_src, dist))
+    return reverse
@@ -0,0 +1,147 @@
+"""Many-to-many distance matrices on a process pool
+
+Each row of an N x M distance matrix is one Dijkstra from a source, and rows are
+independent of each other, so sources are fanned out across worker processes.
+
+Pickling the graph to every worker (or every task) would cost more than the searches.
+Instead the graph is exported once to CSR form (see `csr.py`), and its offsets, targets
+and weights arrays are copied in to one `multiprocessing.shared_memory` block. Workers
+attach to that block when they start and run `shortest_paths_csr` directly on
+memoryviews of it. Target IDs are also sent once per worker, so each task only sends a
+source ID and only the row of M distances comes back. Rows are yielded as they finish,
+in source order, so a caller can start on the first rows while later ones are still
+computing.
+
+distance_matrix
+  * Time = O(N (V + E) log V / processes)
+  * Memory = one shared copy of the graph, O(V) per worker and O(M) per row in flight
+"""
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from csr import CSRGraph, to_csr, shortest_paths_csr
+
+
+# graph shared by the pool and the target IDs, set in each worker by `_attach`
+_shared = None
+_csr = None
+_targets = None
+
+
+def _layout(num_vertices, num_edges):
+    """Byte offsets of the offsets, targets and weights arrays and the total size"""
+    targets_at = 4 * (num_vertices + 1)
+    # keep the doubles 8 byte aligned
+    weights_at = (targets_at + 4 * num_edges + 7) // 8 * 8
+    return 0, targets_at, weights_at, weights_at + 8 * num_edges
+
+
+def _share(csr):
+    """Copies the CSR arrays in to a new shared memory block"""
+    num_vertices, num_edges = len(csr.offsets) - 1, len(csr.targets)
+    offsets_at, targets_at, weights_at, size = _layout(num_vertices, num_edges)
+    shared = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    shared.buf[offsets_at:targets_at] = csr.offsets.tobytes()
+    shared.buf[targets_at:targets_at + 4 * num_edges] = csr.targets.tobytes()
+    shared.buf[weights_at:size] = csr.weights.tobytes()
+    return shared
+
+
+def _attach(name, num_vertices, num_edges, v_targets):
+    """Worker initializer, maps the shared graph as a `CSRGraph` of memoryviews"""
+    global _shared, _csr, _targets
+    offsets_at, targets_at, weights_at, size = _layout(num_vertices, num_edges)
+    _shared = shared_memory.SharedMemory(name=name)
+    buf = _shared.buf
+    _csr = CSRGraph(
+        buf[offsets_at:targets_at].cast('I'),
+        buf[targets_at:targets_at + 4 * num_edges].cast('I'),
+        buf[weights_at:size].cast('d'),
+        None, None)
+    _targets = v_targets
+
+
+def _row(v_source):
+    distances, _ = shortest_paths_csr(_csr, v_source)
+    return array('d', [distances[v] for v in _targets])
+
+
+def distance_matrix(graph, sources, targets, processes=None, chunksize=8):
+    """Yields `(source, row)` with the shortest distance from `source` to every target
+
+    `graph` is either a dict graph or a `CSRGraph`. `row[i]` is the distance to
+    `targets[i]`, or infinity if it can't be reached. `processes` defaults to the number
+    of CPUs, same as ProcessPoolExecutor. `chunksize` is how many sources are sent to a
+    worker at a time.
+
+    >>> graph = {
+    ...     'A': [('B', 4), ('C', 2)],
+    ...     'B': [('C', 5), ('D', 10)],
+    ...     'C': [('E', 3)],
+    ...     'D': [('F', 11)],
+    ...     'E': [('D', 4)],
+    ...     'F': [],
+    ... }
+    >>> for source, row in distance_matrix(graph, ['A', 'B', 'F'], ['D', 'F'], processes=2):
+    ...     print(source, row.tolist())
+    A [9.0, 20.0]
+    B [10.0, 21.0]
+    F [inf, 0.0]
+    """
+    csr = graph if isinstance(graph, CSRGraph) else to_csr(graph)
+    v_targets = [csr.ids[v] for v in targets]
+    sources = list(sources)
+
+    shared = _share(csr)
+    try:
+        with ProcessPoolExecutor(
+                processes, initializer=_attach,
+                initargs=(shared.name, len(csr.offsets) - 1, len(csr.targets), v_targets)) as pool:
+            rows = pool.map(_row, (csr.ids[v] for v in sources), chunksize=chunksize)
+            for source, row in zip(sources, rows):
+                yield source, row
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+if __name__ == '__main__':
+    import gzip
+    import os
+    import random
+    import time
+
+    from openstreetmap import graph_from_openstreetmap
+
+    graph = graph_from_openstreetmap(gzip.open('openstreetmap_ann_arbor_mi.xml.gz'))
+    csr = to_csr(graph)
+
+    random.seed(0)
+    vertices = list(graph)
+    sources = random.sample(vertices, 400)
+    targets = random.sample(vertices, 100)
+    v_targets = [csr.ids[v] for v in targets]
+
+    start = time.perf_counter()
+    serial = []
+    for v in sources:
+        distances, _ = shortest_paths_csr(csr, csr.ids[v])
+        serial.append(array('d', [distances[t] for t in v_targets]))
+    serial_seconds = time.perf_counter() - start
+
+    results = []
+    cpus = os.cpu_count()
+    for processes in sorted({1, 2, 4, cpus}):
+        start = time.perf_counter()
+        rows = [row for _, row in distance_matrix(csr, sources, targets, processes)]
+        results.append((processes, time.perf_counter() - start))
+        assert rows == serial
+
+    print(f"""
+{len(sources)} x {len(targets)} Distance Matrix for {len(graph)} intersections in Ann Arbor, MI ({cpus} CPUs)
+
+* Serial shortest_paths_csr = {serial_seconds:.2f} s
+""" + '\n'.join(
+        f'* distance_matrix, {p} processes = {s:.2f} s ({serial_seconds / s:.1f}x)'
+        for p, s in results))
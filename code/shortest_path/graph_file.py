@@ -0,0 +1,305 @@
+"""Binary cache of road graphs that can be memory mapped
+
+Parsing the gzipped OpenStreetMap XML and building the graph happens on every run of
+e.g. shortest_path_to_coffee.py. `graph_from_openstreetmap_cached` does that once and
+writes the finished graph next to the source, one file per source and cost model. The
+header records the source's size, mtime and SHA-256. A lookup only compares size and
+mtime, the source is hashed only when those changed, e.g. after a `touch`, and an
+edited or replaced XML rebuilds the file in place.
+
+`open_graph` maps the file with `mmap` and exposes it as a `CSRGraph` (see `csr.py`) of
+memoryviews. Nothing is copied, so any number of worker processes that open the same
+file share one copy of it in the OS page cache. `load_graph` turns it back in to a
+regular `Graph`. `graph_from_openstreetmap_cached(..., mapped=True)` returns the mapping
+for callers that only need the CSR arrays.
+
+File layout, all little-endian:
+
+0. Header: magic, number of vertices, how many of them are keys of the graph, number of
+   edges, the size of the name table in bytes, the cost model of the weights, and the
+   size, mtime in ns and SHA-256 of the source it was built from (zeros if none).
+
+1. CSR arrays. uint32 offsets (vertices + 1) and targets (edges), padded to 8 bytes,
+   then float64 weights (edges).
+
+2. Coordinates. float64 lons and lats (vertices), NaN if a vertex has none.
+
+3. Name table. UTF-8 JSON list of every vertex, tuples are written as lists.
+"""
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+
+from csr import CSRGraph, to_csr
+from dijkstra import reverse_graph
+from openstreetmap import Graph, load_openstreetmap, graph_from_ways
+
+
+MAGIC = b'ROADGRF3'
+HEADER = struct.Struct('<8sIIIQ8sQQ32s')
+# where the source stamp (size, mtime_ns, sha256) starts in the header
+STAMP = struct.Struct('<QQ32s')
+STAMP_OFFSET = HEADER.size - STAMP.size
+
+
+def _little_endian(a):
+    """Arrays are written and read in the machine's byte order, files are little-endian"""
+    if sys.byteorder != 'little':
+        a.byteswap()
+    return a
+
+def dump_graph(graph, path, stamp=(0, 0, b'')):
+    """Writes the graph and its `coordinates` and `cost`, if it has them, to `path`
+
+    `stamp` is the (size, mtime_ns, sha256) of the source, see `source_stamp`.
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'example.graph')
+    >>> graph = Graph()
+    >>> graph.update({('A', 'B'): [(('B', 'C'), 1.5)], ('B', 'C'): [(('A', 'B'), 1.5), (('C', 'D'), 2.0)]})
+    >>> graph.coordinates = {('A', 'B'): (0.0, 1.0), ('B', 'C'): (0.5, 1.0), ('C', 'D'): (0.5, 3.0)}
+    >>> dump_graph(graph, path)
+    >>> mapped = open_graph(path)
+    >>> mapped.csr.offsets.tolist(), mapped.csr.targets.tolist(), mapped.csr.names[2]
+    ([0, 1, 3, 3], [1, 0, 2], ('C', 'D'))
+    >>> mapped.close()
+    >>> loaded = load_graph(path)
+    >>> loaded == graph, loaded.coordinates == graph.coordinates, loaded.version != graph.version
+    (True, True, True)
+    >>> loaded.cost
+    'degrees'
+    >>> dict(loaded.reverse)[('C', 'D')]
+    [(('B', 'C'), 2.0)]
+    """
+    csr = to_csr(graph)
+    num_keys = len(graph)
+    coordinates = getattr(graph, 'coordinates', {})
+
+    # corners that no road leads to or from still keep their location
+    for v in coordinates:
+        if v not in csr.ids:
+            csr.ids[v] = len(csr.names)
+            csr.names.append(v)
+            csr.offsets.append(csr.offsets[-1])
+
+    nan = float('nan')
+    lons = array('d', (coordinates.get(v, (nan, nan))[0] for v in csr.names))
+    lats = array('d', (coordinates.get(v, (nan, nan))[1] for v in csr.names))
+    names = json.dumps(csr.names, ensure_ascii=False).encode('utf-8')
+
+    with open(path, 'wb') as f:
+        cost = getattr(graph, 'cost', 'degrees').encode('ascii')
+        f.write(HEADER.pack(MAGIC, len(csr.names), num_keys, len(csr.targets), len(names), cost, *stamp))
+        _little_endian(csr.offsets).tofile(f)
+        _little_endian(csr.targets).tofile(f)
+        # keep the float64 arrays 8 byte aligned
+        f.write(b'\0' * (-f.tell() % 8))
+        for a in (csr.weights, lons, lats):
+            _little_endian(a).tofile(f)
+        f.write(names)
+
+
+class MappedGraph:
+    """Read-only view of a graph file. The CSR arrays and coordinates are read from the `mmap`"""
+    __slots__ = 'file', 'mmap', 'csr', 'num_keys', 'lons', 'lats', 'cost'
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, num_vertices, self.num_keys, num_edges, names_size, cost, *_ = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a graph file')
+        if sys.byteorder != 'little':
+            raise ValueError('Mapping graph files is only supported on little-endian machines')
+        self.cost = cost.rstrip(b'\0').decode('ascii')
+
+        view = memoryview(self.mmap)
+        start = HEADER.size
+        end = start + (num_vertices + 1) * 4
+        offsets = view[start:end].cast('I')
+        start, end = end, end + num_edges * 4
+        targets = view[start:end].cast('I')
+        start = end + (-end % 8)
+        end = start + num_edges * 8
+        weights = view[start:end].cast('d')
+        start, end = end, end + num_vertices * 8
+        self.lons = view[start:end].cast('d')
+        start, end = end, end + num_vertices * 8
+        self.lats = view[start:end].cast('d')
+
+        names = [tuple(v) if isinstance(v, list) else v
+                 for v in json.loads(bytes(view[end:end + names_size]).decode('utf-8'))]
+        ids = {v: i for i, v in enumerate(names)}
+        self.csr = CSRGraph(offsets, targets, weights, names, ids)
+
+    def close(self):
+        for view in (self.csr.offsets, self.csr.targets, self.csr.weights, self.lons, self.lats):
+            view.release()
+        self.mmap.close()
+        self.file.close()
+
+
+def open_graph(path):
+    """Memory maps a file written by `dump_graph`, e.g. for `shortest_paths_csr`"""
+    return MappedGraph(path)
+
+def load_graph(path):
+    """Reads a file written by `dump_graph` back in to a `Graph`, with `reverse` rebuilt"""
+    mapped = open_graph(path)
+    offsets, targets, weights, names, _ = mapped.csr
+
+    graph = Graph()
+    graph.cost = mapped.cost
+    for v, name in enumerate(names):
+        start, end = offsets[v], offsets[v + 1]
+        if v < mapped.num_keys or start != end:
+            graph[name] = [(names[t], w) for t, w in zip(targets[start:end], weights[start:end])]
+        lon, lat = mapped.lons[v], mapped.lats[v]
+        # NaN is the only value not equal to itself
+        if lon == lon:
+            graph.coordinates[name] = (lon, lat)
+    graph.reverse = reverse_graph(graph)
+
+    mapped.close()
+    return graph
+
+def cache_path(source, cache_dir=None, cost='degrees'):
+    """Where the cached graph of the source XML goes, one file per source and cost"""
+    name = f'{os.path.basename(source)}.{cost}.graph'
+    return os.path.join(cache_dir or os.path.dirname(source) or '.', name)
+
+def source_sha256(source):
+    """SHA-256 digest of the source file, read in 1 MB chunks"""
+    sha256 = hashlib.sha256()
+    with open(source, 'rb') as f:
+        for chunk in iter(lambda: f.read(2 ** 20), b''):
+            sha256.update(chunk)
+    return sha256.digest()
+
+def source_stamp(source):
+    """(size, mtime_ns, sha256) of the source, as kept in the header of its cache file"""
+    stat = os.stat(source)
+    return stat.st_size, stat.st_mtime_ns, source_sha256(source)
+
+def is_fresh(path, source):
+    """Whether the cache file at `path` was built from the source as it is now
+
+    Matching size and mtime are trusted without reading the source. Otherwise the source
+    is hashed, and if only its mtime changed the new one is written to the header.
+
+    >>> import tempfile, time
+    >>> directory = tempfile.mkdtemp()
+    >>> source, path = os.path.join(directory, 'map.xml'), os.path.join(directory, 'map.graph')
+    >>> with open(source, 'w') as f: f.write('<osm/>')
+    6
+    >>> dump_graph(Graph(), path, source_stamp(source))
+    >>> is_fresh(path, source)
+    True
+    >>> os.utime(source, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    >>> is_fresh(path, source), is_fresh(path, source)
+    (True, True)
+    >>> with open(source, 'w') as f: f.write('<osm />')
+    7
+    >>> is_fresh(path, source)
+    False
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+    except FileNotFoundError:
+        return False
+    if len(header) < HEADER.size or not header.startswith(MAGIC):
+        return False
+    size, mtime_ns, sha256 = STAMP.unpack_from(header, STAMP_OFFSET)
+    stat = os.stat(source)
+    if (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+        return True
+    if size != stat.st_size or sha256 != source_sha256(source):
+        return False
+    # same contents with a new mtime, skip the hash next time
+    with open(path, 'r+b') as f:
+        f.seek(STAMP_OFFSET)
+        f.write(STAMP.pack(size, stat.st_mtime_ns, sha256))
+    return True
+
+def graph_from_openstreetmap_cached(source, cache_dir=None, cost='degrees', mapped=False):
+    """Same graph as `graph_from_openstreetmap`, read from the cache if it was built before
+
+    :param source: path to the plain or gzip XML export from OpenStreetMap
+    :param cache_dir: where cache files go, defaults to next to `source`
+    :param cost: edge weights, `degrees`, `meters` or `seconds`, see `cost_models.py`
+    :param mapped: return the `MappedGraph` of the cache file instead of a `Graph`,
+        enough for `shortest_paths_csr` and much cheaper to open. Close it when done.
+    """
+    path = cache_path(source, cache_dir, cost)
+    if is_fresh(path, source):
+        return open_graph(path) if mapped else load_graph(path)
+
+    stamp = source_stamp(source)
+    named_ways, locations, _ = load_openstreetmap(source)
+    graph = graph_from_ways(named_ways, locations, cost)
+    # write to a temporary name first so concurrent readers never see half a file
+    temporary = f'{path}.{os.getpid()}.tmp'
+    dump_graph(graph, temporary, stamp)
+    os.replace(temporary, path)
+
+    # older caches put the source's hash and mtime in the name, one file per version
+    stale = re.compile(rf'{re.escape(os.path.basename(source))}\.[0-9a-f]{{16}}\.\d+\.{cost}\.graph')
+    directory = os.path.dirname(path)
+    for name in os.listdir(directory):
+        if stale.fullmatch(name):
+            os.remove(os.path.join(directory, name))
+    return open_graph(path) if mapped else graph
+
+
+if __name__ == '__main__':
+    import gzip
+    import time
+
+    from openstreetmap import graph_from_openstreetmap
+
+    source = 'openstreetmap_ann_arbor_mi.xml.gz'
+
+    start = time.perf_counter()
+    parsed = graph_from_openstreetmap(gzip.open(source))
+    parse_seconds = time.perf_counter() - start
+
+    path = cache_path(source)
+    if os.path.exists(path):
+        os.remove(path)
+
+    start = time.perf_counter()
+    graph_from_openstreetmap_cached(source)
+    miss_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cached = graph_from_openstreetmap_cached(source)
+    hit_seconds = time.perf_counter() - start
+    assert cached == parsed and cached.coordinates == parsed.coordinates
+
+    start = time.perf_counter()
+    mapped = graph_from_openstreetmap_cached(source, mapped=True)
+    mapped_seconds = time.perf_counter() - start
+    mapped.close()
+
+    start = time.perf_counter()
+    is_fresh(path, source)
+    check_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    source_sha256(source)
+    hash_seconds = time.perf_counter() - start
+
+    print(f"""
+Graph Cache for {source} ({os.path.getsize(path) / 2 ** 10:.0f} KB cache file)
+
+* graph_from_openstreetmap = {parse_seconds * 1000:.0f} ms
+* graph_from_openstreetmap_cached, first run = {miss_seconds * 1000:.0f} ms
+* graph_from_openstreetmap_cached, cached = {hit_seconds * 1000:.1f} ms
+* graph_from_openstreetmap_cached, cached, mapped=True = {mapped_seconds * 1000:.1f} ms
+* is_fresh = {check_seconds * 1000:.2f} ms, hashing the source only when its size or mtime changed = {hash_seconds * 1000:.1f} ms
+""")
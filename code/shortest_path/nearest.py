@@ -0,0 +1,120 @@
+"""Nearest facility queries, e.g. "where is the closest coffee shop?"
+
+nearest_facilities = Dijkstra from one start that stops once `k` of the facilities
+are settled. Facilities are settled in order of distance, so the first `k` settled
+are the nearest `k` and nothing past the k-th needs to be explored.
+  * Time = O((V + E) log V) worst case, typically only the area within reach of the k-th
+  * Memory = O(V)
+
+nearest_facility_map = multi-source Dijkstra, the queue starts with every facility at
+distance 0. Each vertex is settled by whichever facility reaches it first, which is its
+nearest one, so one pass splits the whole graph in to Voronoi-style regions.
+  * Time = O((V + E) log V), the same as a single `shortest_paths`
+  * Memory = O(V)
+"""
+import sys
+from heapq import heappush, heappop
+from itertools import count
+
+from dijkstra import Route, path_to
+
+
+def nearest_facilities(graph, v_start, facilities, k=1):
+    """Finds the `k` facilities closest to `v_start`
+
+    Returns a list of up to `k` `Route`s, nearest first. It is shorter if fewer
+    facilities can be reached. `settled` is how many vertices were settled in total when
+    each facility was found.
+
+    >>> graph = {
+    ...     'A': [('B', 4), ('C', 2)],
+    ...     'B': [('C', 5), ('D', 10)],
+    ...     'C': [('E', 3)],
+    ...     'D': [('F', 11)],
+    ...     'E': [('D', 4)],
+    ...     'F': [],
+    ... }
+    >>> nearest_facilities(graph, 'A', {'B', 'D', 'F'}, k=2)
+    [Route(distance=4, path=['A', 'B'], settled=3), Route(distance=9, path=['A', 'C', 'E', 'D'], settled=5)]
+    >>> nearest_facilities(graph, 'E', {'B'})
+    []
+    """
+    found = []
+    paths = {v_start: (0, None)}
+    settled = set()
+    queue = [(0, v_start)]
+    while queue and len(found) < k:
+        total_dist, v_dst = heappop(queue)
+        # skip stale entries for vertices that already have their final distance
+        if v_dst in settled:
+            continue
+        settled.add(v_dst)
+        if v_dst in facilities:
+            found.append(Route(total_dist, path_to(paths, v_start, v_dst), len(settled)))
+        for v_nxt, dist in graph[v_dst]:
+            _d = total_dist + dist
+            if v_nxt not in settled and paths.get(v_nxt, (sys.maxsize,))[0] > _d:
+                paths[v_nxt] = (_d, v_dst)
+                heappush(queue, (_d, v_nxt))
+    return found
+
+
+def nearest_facility_map(graph, facilities, reverse=None):
+    """Finds the nearest facility for every vertex in one pass
+
+    Searches outward from all facilities at once on `reverse`, the graph with every edge
+    reversed, so distances are measured from each vertex *to* its facility. `reverse`
+    defaults to `graph.reverse` made by `graph_from_openstreetmap`.
+
+    Returns `{vertex: (distance, facility, next vertex)}` where following next vertices
+    leads to the facility, see `path_to_facility`. Vertices that can't reach any
+    facility are left out.
+
+    >>> from dijkstra import reverse_graph
+    >>> graph = {
+    ...     'A': [('B', 1)],
+    ...     'B': [('A', 1), ('C', 1)],
+    ...     'C': [('B', 1), ('D', 3)],
+    ...     'D': [('C', 3)],
+    ... }
+    >>> nearest = nearest_facility_map(graph, ['A', 'D'], reverse_graph(graph))
+    >>> nearest['C'], path_to_facility(nearest, 'C')
+    ((2, 'A', 'B'), ['C', 'B', 'A'])
+    >>> nearest['D']
+    (0, 'D', None)
+
+    Ties in distance, e.g. over zero-weight edges, never compare the vertices themselves
+
+    >>> graph = {1: [('B', 0)], 'B': [(1, 0), ('C', 0)], 'C': [('B', 0)]}
+    >>> nearest_facility_map(graph, [1, 'B', 'C'], reverse_graph(graph))
+    {1: (0, 1, None), 'B': (0, 'B', None), 'C': (0, 'C', None)}
+    """
+    if reverse is None:
+        reverse = graph.reverse
+
+    nearest = {}
+    queue = []
+    # breaks ties in distance so vertices, facilities and None are never compared
+    order = count()
+    for v in facilities:
+        heappush(queue, (0, next(order), v, v, None))
+    while queue:
+        total_dist, _, v_dst, facility, v_next = heappop(queue)
+        # the first time a vertex is popped it is from its nearest facility
+        if v_dst in nearest:
+            continue
+        nearest[v_dst] = (total_dist, facility, v_next)
+        for v_prv, dist in reverse.get(v_dst, ()):
+            if v_prv not in nearest:
+                heappush(queue, (total_dist + dist, next(order), v_prv, facility, v_dst))
+    return nearest
+
+
+def path_to_facility(nearest, v_src):
+    """Follows `nearest_facility_map` from `v_src` and returns the path to its facility"""
+    path = [v_src]
+    _, _, v_next = nearest[v_src]
+    while v_next is not None:
+        path.append(v_next)
+        _, _, v_next = nearest[v_next]
+    return path
@@ -14,9 +14,161 @@ Example usage is in Jayson's algorithm's repo:
 
 """
 
+import copy
+import gzip
+import time
+from array import array
+from collections import Counter, defaultdict, deque, namedtuple
+from itertools import count
+from xml.parsers.expat import ParserCreate
 from xml.sax import parse
 from xml.sax.handler import ContentHandler
 
+from cost_models import edge_weights, speed
+from dijkstra import reverse_graph
+
+
+class Graph(defaultdict):
+    """Same `{vertex: [(vertex, dist), ...]}` graph as a plain dict plus vertex locations
+
+    `coordinates` maps every vertex (a street intersection) to its (lon, lat) as floats,
+    e.g. for the straight-line distance heuristic of A* in `astar.py`. `reverse` is the
+    same graph with every edge reversed, e.g. for searching backwards from a target in
+    `bidirectional.py`.
+
+    `cost` is the cost model of the edge weights, see `cost_models.py`.
+
+    `version` is unique to every graph built in this process. Anything derived from the
+    graph, e.g. cached shortest path trees in `tree_cache.py`, is keyed by it so that a
+    rebuilt graph is never confused with the old one.
+
+    Edges can be changed in place, e.g. for closures and slowdowns, with `set_weight`,
+    `disable_edge` and `enable_edge`. They update `reverse` too, count up `revision`
+    and append `(v_src, v_dst, old dist, new dist)` to `changes`, with infinity for a
+    disabled edge, so caches can invalidate only what a change affects. `changes` only
+    keeps the last `MAX_CHANGES`, anything further behind than that has to start over.
+    Other derived structures such as CSR exports or contraction hierarchies have to be
+    rebuilt, `(version, revision)` tells if they were made from the current edges.
+
+    >>> graph = Graph()
+    >>> graph.update({'A': [('B', 4), ('C', 2)], 'B': [], 'C': [('B', 1)]})
+    >>> graph.reverse = reverse_graph(graph)
+    >>> graph.set_weight('C', 'B', 5)
+    >>> graph.disable_edge('A', 'B')
+    >>> graph['A'], graph.reverse['B']
+    ([('C', 2)], [('C', 5)])
+    >>> graph.enable_edge('A', 'B')
+    >>> graph['A'], graph.revision, list(graph.changes)
+    ([('C', 2), ('B', 4)], 3, [('C', 'B', 1, 5), ('A', 'B', 4, inf), ('A', 'B', inf, 4)])
+
+    Pickling a graph keeps its locations, reverse edges, version and changes
+
+    >>> import pickle
+    >>> copied = pickle.loads(pickle.dumps(graph))
+    >>> copied == graph, copied.reverse == graph.reverse, copied.version == graph.version
+    (True, True, True)
+    >>> copied.changes == graph.changes, copied.disabled == graph.disabled, copied['Z']
+    (True, True, [])
+
+    A copy is a new graph with its own version, so editing it leaves the original alone
+
+    >>> edited = graph.copy()
+    >>> edited.disable_edge('A', 'C')
+    >>> edited.version != graph.version, graph['A'], graph.reverse['C'], len(graph.changes)
+    (True, [('C', 2), ('B', 4)], [('A', 2)], 3)
+    >>> edited['A'], edited.disabled, list(edited.changes)
+    ([('B', 4)], {('A', 'C'): 2}, [('A', 'C', 2, inf)])
+    """
+    _versions = count()
+    MAX_CHANGES = 4096
+
+    def __init__(self, default_factory=list):
+        super().__init__(default_factory)
+        self.coordinates = {}
+        self.reverse = {}
+        self.cost = 'degrees'
+        self.version = next(Graph._versions)
+        self.disabled = {}
+        self.revision = 0
+        self.changes = deque(maxlen=self.MAX_CHANGES)
+
+    def __reduce__(self):
+        # defaultdict only pickles its items, the attributes go along as the state
+        return type(self), (self.default_factory,), self.__dict__.copy(), None, iter(self.items())
+
+    def copy(self):
+        """Copy that can be edited on its own, with a new version and empty `changes`
+
+        Edge lists, `reverse` and `disabled` are copied, `coordinates` is shared.
+        """
+        graph = type(self)(self.default_factory)
+        graph.update((v, list(edges)) for v, edges in self.items())
+        graph.__dict__.update((k, v) for k, v in self.__dict__.items() if k not in ('version', 'changes'))
+        graph.reverse = copy.copy(self.reverse)
+        for v, edges in graph.reverse.items():
+            graph.reverse[v] = list(edges)
+        graph.disabled = dict(self.disabled)
+        graph.changes = deque(maxlen=self.changes.maxlen)
+        return graph
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        graph = type(self)(self.default_factory)
+        memo[id(self)] = graph
+        for v, edges in self.items():
+            graph[copy.deepcopy(v, memo)] = copy.deepcopy(edges, memo)
+        # everything but the version, a copy is a different graph to caches
+        graph.__dict__.update(copy.deepcopy({k: v for k, v in self.__dict__.items() if k != 'version'}, memo))
+        return graph
+
+    def _replace(self, edges, v, dist):
+        """Sets the weight of every edge to `v` in a list of edges, returns the old weight"""
+        old = None
+        for i, (v_nxt, _dist) in enumerate(edges):
+            if v_nxt == v:
+                old = _dist
+                edges[i] = (v, dist)
+        return old
+
+    def set_weight(self, v_src, v_dst, dist):
+        """Changes the weight of the edge from `v_src` to `v_dst`, disabled or not"""
+        if (v_src, v_dst) in self.disabled:
+            self.disabled[v_src, v_dst] = dist
+            return
+        old = self._replace(self.get(v_src, []), v_dst, dist)
+        if old is None:
+            raise KeyError(f'No edge from {v_src} to {v_dst}')
+        self._replace(self.reverse.get(v_dst, []), v_src, dist)
+        self._changed(v_src, v_dst, old, dist)
+
+    def disable_edge(self, v_src, v_dst):
+        """Removes the edge from `v_src` to `v_dst` until `enable_edge`, e.g. for a closure"""
+        if (v_src, v_dst) in self.disabled:
+            return
+        edges = self.get(v_src, [])
+        old = next((dist for v_nxt, dist in edges if v_nxt == v_dst), None)
+        if old is None:
+            raise KeyError(f'No edge from {v_src} to {v_dst}')
+        edges[:] = [edge for edge in edges if edge[0] != v_dst]
+        if v_dst in self.reverse:
+            reverse = self.reverse[v_dst]
+            reverse[:] = [edge for edge in reverse if edge[0] != v_src]
+        self.disabled[v_src, v_dst] = old
+        self._changed(v_src, v_dst, old, float('inf'))
+
+    def enable_edge(self, v_src, v_dst):
+        """Restores an edge removed by `disable_edge`"""
+        dist = self.disabled.pop((v_src, v_dst))
+        self[v_src].append((v_dst, dist))
+        if self.reverse:
+            self.reverse.setdefault(v_dst, []).append((v_src, dist))
+        self._changed(v_src, v_dst, float('inf'), dist)
+
+    def _changed(self, v_src, v_dst, old, new):
+        self.revision += 1
+        self.changes.append((v_src, v_dst, old, new))
+
 
 class MyContentHandler(ContentHandler):
 
@@ -50,47 +202,52 @@ class MyContentHandler(ContentHandler):
 
     def endElement(self, name):
         if name == 'way' and self._way_highway:
-            self.ways.append((self._way_id, self._way_name, self._way_nodes))
+            self.ways.append((self._way_id, self._way_name, self._way_nodes, self._way_highway))
 
 
-def graph_from_openstreetmap(xml):
+def graph_from_openstreetmap(xml, cost='degrees'):
     """Converts OpenStreetMap XML exports to a map of vertices and edges
 
     Useful to convert open street map data in to something that is easily
     worked with in code examples. e.g. demonstrating Dijkstra's shortest path.
 
     :param xml: XML export from OpenStreetMap
+    :param cost: edge weights, `degrees`, `meters` or `seconds`, see `cost_models.py`
     :return: graph with street corners as keys (nodes) and a list of roads as values (edges)
     """
-    from math import sqrt, pow
-    from collections import defaultdict
-
     # extract roads from the XML
     handler = MyContentHandler()
     parse(xml, handler)
 
     # only consider named roads
     named_ways = [w for w in handler.ways if w[1]]
+    return graph_from_ways(named_ways, handler.nodes, cost)
+
 
+def graph_from_ways(named_ways, locations, cost='degrees'):
+    """Makes the graph from named roads, e.g. from `load_openstreetmap`
+
+    :param named_ways: list of (id, name, node IDs, highway class) for every named road
+    :param locations: maps node IDs to their (lon, lat)
+    :param cost: edge weights, `degrees`, `meters` or `seconds`, see `cost_models.py`
+    :return: graph with street corners as keys (nodes) and a list of roads as values (edges)
+    """
     # map all streets to nodes
     node_map = defaultdict(set)
-    for _id, name, nodes in named_ways:
+    for _id, name, nodes, _highway in named_ways:
         for id in nodes:
             node_map[id].add(name)
 
     def key(_r1, _r2):
         return (_r1, _r2) if _r1 < _r2 else (_r2, _r1)
 
-    def distance(x1, y1, x2, y2):
-        return sqrt(pow((float(x1) - float(x2)), 2) + pow((float(y1) - float(y2)), 2))
-
     # map all connected roads
     connected_roads = {}
-    for _id, r1, nodes in named_ways:
+    for _id, r1, nodes, _highway in named_ways:
         for node_id in nodes:
             for r2 in node_map[node_id]:
                 if r1 != r2:
-                    connected_roads[key(r1, r2)] = handler.nodes[node_id]
+                    connected_roads[key(r1, r2)] = locations[node_id]
 
     # create a fast lookup of all connected roads given a road name
     road2roads = defaultdict(set)
@@ -99,20 +256,200 @@ def graph_from_openstreetmap(xml):
         road2roads[r2].add(r1)
 
     # make a graph with street corners as vertices and roads as edges
-    graph = defaultdict(list)
+    graph = Graph()
+    graph.cost = cost
+    for corner, (lon, lat) in connected_roads.items():
+        graph.coordinates[corner] = (float(lon), float(lat))
+
+    # every edge follows one road from a corner to another corner on it, with the
+    # (lon, lat) of both ends collected in the same pass to weigh them all in one batch
+    coordinates = graph.coordinates
+    edges = []
+    ends = array('d')
     for r1, r2 in connected_roads.keys():
+        v_src = key(r1, r2)
         for r3 in road2roads[r1]:
-            if r2 == r3:
-                continue
-            x1, y1 = connected_roads[key(r1, r2)]
-            x2, y2 = connected_roads[key(r1, r3)]
-            dist = distance(x1, y1, x2, y2)
-            graph[key(r1, r2)].append((key(r1, r3), dist))
+            if r2 != r3:
+                v_dst = key(r1, r3)
+                edges.append((v_src, v_dst, r1))
+                ends.extend(coordinates[v_src] + coordinates[v_dst])
         for r3 in road2roads[r2]:
-            if r1 == r3:
-                continue
-            x1, y1 = connected_roads[key(r1, r2)]
-            x2, y2 = connected_roads[key(r2, r3)]
-            dist = distance(x1, y1, x2, y2)
-            graph[key(r1, r2)].append((key(r2, r3), dist))
+            if r1 != r3:
+                v_dst = key(r2, r3)
+                edges.append((v_src, v_dst, r2))
+                ends.extend(coordinates[v_src] + coordinates[v_dst])
+    lon1, lat1, lon2, lat2 = ends[0::4], ends[1::4], ends[2::4], ends[3::4]
+
+    speeds = None
+    if cost == 'seconds':
+        road_speeds = _road_speeds(named_ways)
+        speeds = array('d', (road_speeds[road] for _, _, road in edges))
+    weights = edge_weights(lon1, lat1, lon2, lat2, cost, speeds)
+
+    for (v_src, v_dst, _), dist in zip(edges, weights):
+        graph[v_src].append((v_dst, dist))
+
+    graph.reverse = reverse_graph(graph)
     return graph
+
+
+def _road_speeds(named_ways):
+    """Speed in meters per second of each named road
+
+    A name can cover several ways, e.g. a road and its ramps. The `highway` class that
+    covers the most nodes wins.
+
+    >>> ways = [('1', 'Main Street', ['a', 'b', 'c'], 'primary'), ('2', 'Main Street', ['c', 'd'], 'primary_link')]
+    >>> _road_speeds(ways)
+    {'Main Street': 16.666666666666668}
+    """
+    classes = defaultdict(Counter)
+    for _id, name, nodes, highway in named_ways:
+        classes[name][highway] += len(nodes)
+    return {name: speed(counts.most_common(1)[0][0]) for name, counts in classes.items()}
+
+
+OSMStats = namedtuple('OSMStats', 'elements nodes kept_nodes ways seconds elements_per_sec')
+
+
+class NodeLocations:
+    """(lon, lat) of OpenStreetMap nodes as floats in two compact arrays
+
+    `index` maps a node ID to its position in `lons` and `lats`, about 8 bytes per
+    coordinate instead of a tuple of two strings per node.
+
+    >>> nodes = NodeLocations()
+    >>> nodes.add(42, '-83.75', '42.28')
+    >>> nodes[42], 42 in nodes, len(nodes)
+    ((-83.75, 42.28), True, 1)
+    """
+    __slots__ = 'index', 'lons', 'lats'
+
+    def __init__(self):
+        self.index = {}
+        self.lons = array('d')
+        self.lats = array('d')
+
+    def add(self, node_id, lon, lat):
+        self.index[node_id] = len(self.lons)
+        self.lons.append(float(lon))
+        self.lats.append(float(lat))
+
+    def __getitem__(self, node_id):
+        i = self.index[node_id]
+        return self.lons[i], self.lats[i]
+
+    def __contains__(self, node_id):
+        return node_id in self.index
+
+    def __len__(self):
+        return len(self.lons)
+
+
+def _open(path):
+    """Opens a plain or gzip XML file, using the gzip magic bytes rather than the name"""
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    return gzip.open(path) if magic == b'\x1f\x8b' else open(path, 'rb')
+
+
+def load_openstreetmap(path):
+    """Reads the named roads and only the nodes they use from an OpenStreetMap XML file
+
+    One streaming pass with `expat`. OpenStreetMap files list every node before any
+    way, so the coordinates of all nodes are kept as an int64 ID and two float64s in
+    flat arrays, 24 bytes per node, until the ways say which ones are used. Only those
+    end up in the returned `NodeLocations`.
+
+    :param path: plain or gzip XML export from OpenStreetMap
+    :return: (named ways, `NodeLocations`, `OSMStats`), see `graph_from_ways`
+    """
+    start = time.perf_counter()
+    # top-level node, way and relation elements, for throughput
+    elements = 0
+
+    ids, lons, lats = array('q'), array('d'), array('d')
+    named_ways = []
+    referenced = set()
+    way = None
+
+    def start_element(tag, attrs):
+        nonlocal elements, way
+        if tag == 'node':
+            elements += 1
+            ids.append(int(attrs['id']))
+            lons.append(float(attrs['lon']))
+            lats.append(float(attrs['lat']))
+        elif way is not None:
+            if tag == 'nd':
+                way[2].append(int(attrs['ref']))
+            elif tag == 'tag':
+                k = attrs['k']
+                if k == 'name':
+                    way[1] = attrs['v']
+                elif k == 'highway':
+                    way[3] = attrs['v']
+        elif tag == 'way':
+            elements += 1
+            # id, name, node IDs, highway class
+            way = [attrs['id'], None, [], None]
+        elif tag == 'relation':
+            elements += 1
+
+    def end_element(tag):
+        nonlocal way
+        if tag == 'way':
+            if way[1] and way[3]:
+                named_ways.append(tuple(way))
+                referenced.update(way[2])
+            way = None
+
+    parser = ParserCreate()
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    with _open(path) as f:
+        parser.ParseFile(f)
+
+    nodes = NodeLocations()
+    for i, node_id in enumerate(ids):
+        if node_id in referenced:
+            nodes.add(node_id, lons[i], lats[i])
+
+    seconds = time.perf_counter() - start
+    stats = OSMStats(elements, len(ids), len(nodes), len(named_ways), seconds, elements / seconds)
+    return named_ways, nodes, stats
+
+
+if __name__ == '__main__':
+    import sys
+    import tracemalloc
+
+    path = sys.argv[1] if len(sys.argv) > 1 else 'openstreetmap_ann_arbor_mi.xml.gz'
+
+    start = time.perf_counter()
+    graph = graph_from_openstreetmap(_open(path))
+    sax_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    named_ways, locations, stats = load_openstreetmap(path)
+    graph = graph_from_ways(named_ways, locations)
+    expat_seconds = time.perf_counter() - start
+
+    # peak memory is measured separately, tracing slows parsing down a lot
+    tracemalloc.start()
+    graph_from_openstreetmap(_open(path))
+    sax_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    graph_from_ways(*load_openstreetmap(path)[:2])
+    expat_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(f"""
+OpenStreetMap Loading for {path}
+
+* graph_from_openstreetmap (SAX, all nodes) = {sax_seconds:.2f} s, {sax_peak / 2 ** 20:.1f} MB peak
+* load_openstreetmap + graph_from_ways (expat, used nodes) = {expat_seconds:.2f} s, {expat_peak / 2 ** 20:.1f} MB peak
+* {stats.elements} elements read at {stats.elements_per_sec:,.0f} elements/s
+* {stats.kept_nodes} of {stats.nodes} nodes kept for {stats.ways} named roads
+* {len(graph)} intersections
+""")
@@ -0,0 +1,274 @@
+"""Pluggable priority queues for Dijkstra
+
+`shortest_paths` pushes a (distance, vertex) tuple on a `heapq` for every improvement
+and skips stale entries as they are popped. That is hard to beat in Python, but it
+isn't the only option. `shortest_paths(graph, start, queue=...)` runs the same loop on
+any empty queue with this interface:
+
+* `push((key, item))` = add `item` with priority `key`, or lower its key if it is queued
+* `pop()` = remove and return `(key, item)` with the smallest key, IndexError if empty
+* `len(queue)` = how many entries are queued
+
+Queues:
+
+* HeapQueue = `heapq`, `push` always adds and old entries go stale
+  * push/pop = O(log n)
+* IndexedHeap = binary heap that knows where each item is, so `push` lowers the key
+  in place (decrease-key). Nothing goes stale, the heap never holds more than V items.
+  * push/pop = O(log V)
+* BucketQueue = Dial's algorithm for integer weights up to `max_weight`. A circular
+  array of `max_weight + 1` buckets. Every queued key is within `max_weight` of the
+  smallest one, so each lands in its own bucket.
+  * push = O(1), pop = O(1) amortized plus empty buckets skipped, O(V + E + D) total
+    for a longest distance of D
+* RadixHeap = for integer keys that never go below the last popped one, which holds
+  for Dijkstra. Keys go in bucket `(key ^ last).bit_length()`. Popping from an empty
+  bucket 0 redistributes the first non-empty bucket around its smallest key, and each
+  entry only ever moves to lower buckets.
+  * push = O(1), pop = O(log C) amortized for a maximum weight of C
+
+BucketQueue and RadixHeap require integer, non-negative weights. E.g. a graph built
+with `cost='meters'` and weights rounded to whole meters.
+
+>>> from dijkstra import shortest_paths
+>>> graph = {
+...     'A': [('B', 4), ('C', 2)],
+...     'B': [('C', 5), ('D', 10)],
+...     'C': [('E', 3)],
+...     'D': [('F', 11), ('A', 1)],
+...     'E': [('D', 4)],
+...     'F': [],
+... }
+>>> tree = shortest_paths(graph, 'A')
+>>> all(shortest_paths(graph, 'A', queue=q) == tree
+...     for q in (HeapQueue(), IndexedHeap(), BucketQueue(11), RadixHeap()))
+True
+"""
+from heapq import heappush, heappop
+
+
+class HeapQueue:
+    """`heapq` of (key, item) tuples. Stale entries are left for the caller to skip
+
+    >>> q = HeapQueue()
+    >>> q.push((5, 'a')); q.push((3, 'b')); q.push((1, 'a'))
+    >>> [q.pop() for x in range(len(q))]
+    [(1, 'a'), (3, 'b'), (5, 'a')]
+    """
+    __slots__ = 'heap',
+
+    def __init__(self):
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, entry):
+        heappush(self.heap, entry)
+
+    def pop(self):
+        return heappop(self.heap)
+
+
+class IndexedHeap:
+    """Binary min-heap with decrease-key. `push` of a queued item lowers its key in place
+
+    >>> q = IndexedHeap()
+    >>> q.push((5, 'a')); q.push((3, 'b')); q.push((1, 'a')); q.push((4, 'b'))
+    >>> [q.pop() for x in range(len(q))]
+    [(1, 'a'), (3, 'b')]
+    >>> q.pop()
+    Traceback (most recent call last):
+    ...
+    IndexError: pop from an empty queue
+    """
+    __slots__ = 'keys', 'items', 'positions'
+
+    def __init__(self):
+        self.keys = []
+        self.items = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def push(self, entry):
+        key, item = entry
+        i = self.positions.get(item)
+        if i is None:
+            i = len(self.items)
+            self.keys.append(key)
+            self.items.append(item)
+        elif key >= self.keys[i]:
+            return
+        self._sift_up(i, key, item)
+
+    def pop(self):
+        if not self.items:
+            raise IndexError('pop from an empty queue')
+        keys, items, positions = self.keys, self.items, self.positions
+        key, item = keys[0], items[0]
+        del positions[item]
+        last_key, last_item = keys.pop(), items.pop()
+        if items:
+            self._sift_down(0, last_key, last_item)
+        return key, item
+
+    def _sift_up(self, i, key, item):
+        keys, items, positions = self.keys, self.items, self.positions
+        while i:
+            parent = (i - 1) >> 1
+            if keys[parent] <= key:
+                break
+            keys[i], items[i] = keys[parent], items[parent]
+            positions[items[i]] = i
+            i = parent
+        keys[i], items[i] = key, item
+        positions[item] = i
+
+    def _sift_down(self, i, key, item):
+        keys, items, positions = self.keys, self.items, self.positions
+        n = len(items)
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and keys[child + 1] < keys[child]:
+                child += 1
+            if key <= keys[child]:
+                break
+            keys[i], items[i] = keys[child], items[child]
+            positions[items[i]] = i
+            i = child
+        keys[i], items[i] = key, item
+        positions[item] = i
+
+
+class BucketQueue:
+    """Dial's bucket queue for integer keys no more than `max_weight` past the smallest
+
+    >>> q = BucketQueue(max_weight=4)
+    >>> q.push((4, 'a')); q.push((2, 'b')); q.push((2, 'c'))
+    >>> q.pop(), q.pop()
+    ((2, 'c'), (2, 'b'))
+    >>> q.push((6, 'd'))
+    >>> q.pop(), q.pop()
+    ((4, 'a'), (6, 'd'))
+    >>> q.pop()
+    Traceback (most recent call last):
+    ...
+    IndexError: pop from an empty queue
+    """
+    __slots__ = 'buckets', 'cursor', 'size'
+
+    def __init__(self, max_weight):
+        self.buckets = [[] for x in range(max_weight + 1)]
+        self.cursor = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, entry):
+        key, item = entry
+        self.buckets[key % len(self.buckets)].append(item)
+        self.size += 1
+
+    def pop(self):
+        if not self.size:
+            raise IndexError('pop from an empty queue')
+        buckets, n = self.buckets, len(self.buckets)
+        # keys never go below the last popped one, so just walk forward to the next entry
+        while not buckets[self.cursor % n]:
+            self.cursor += 1
+        self.size -= 1
+        return self.cursor, buckets[self.cursor % n].pop()
+
+
+class RadixHeap:
+    """Monotone radix heap for integer keys, no key may be less than the last popped one
+
+    >>> q = RadixHeap()
+    >>> q.push((9, 'a')); q.push((2, 'b')); q.push((7, 'c'))
+    >>> q.pop()
+    (2, 'b')
+    >>> q.push((3, 'd'))
+    >>> [q.pop() for x in range(len(q))]
+    [(3, 'd'), (7, 'c'), (9, 'a')]
+    """
+    __slots__ = 'buckets', 'last', 'size'
+
+    def __init__(self, bits=64):
+        self.buckets = [[] for x in range(bits + 1)]
+        self.last = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, entry):
+        self.buckets[(entry[0] ^ self.last).bit_length()].append(entry)
+        self.size += 1
+
+    def pop(self):
+        if not self.size:
+            raise IndexError('pop from an empty queue')
+        buckets = self.buckets
+        if not buckets[0]:
+            i = 1
+            while not buckets[i]:
+                i += 1
+            # everything in bucket i moves to a lower bucket relative to its smallest key
+            entries = buckets[i]
+            buckets[i] = []
+            last = self.last = min(key for key, _ in entries)
+            for key, item in entries:
+                buckets[(key ^ last).bit_length()].append((key, item))
+        self.size -= 1
+        return buckets[0].pop()
+
+
+if __name__ == '__main__':
+    import gzip
+    from timeit import timeit
+    import random
+
+    from openstreetmap import graph_from_openstreetmap
+    from dijkstra import shortest_paths
+
+    # whole meters are precise enough for walking directions
+    meters = graph_from_openstreetmap(gzip.open('openstreetmap_ann_arbor_mi.xml.gz'), cost='meters')
+    graph = {v: [(v_nxt, round(dist)) for v_nxt, dist in edges] for v, edges in meters.items()}
+    max_weight = max(dist for edges in graph.values() for _, dist in edges)
+
+    random.seed(0)
+    sources = random.sample(list(graph), 100)
+
+    queues = {
+        'HeapQueue': HeapQueue,
+        'IndexedHeap': IndexedHeap,
+        'BucketQueue': lambda: BucketQueue(max_weight),
+        'RadixHeap': RadixHeap,
+    }
+
+    # every queue must agree with the default heapq before timing means anything
+    for v_start in sources[:10]:
+        expected = {v: d for v, (d, _) in shortest_paths(graph, v_start).items()}
+        for make in queues.values():
+            assert {v: d for v, (d, _) in shortest_paths(graph, v_start, queue=make()).items()} == expected
+
+    runs = {'dijkstra.shortest_paths (heapq list)': lambda v: shortest_paths(graph, v)}
+    runs.update({name: lambda v, make=make: shortest_paths(graph, v, queue=make()) for name, make in queues.items()})
+
+    # interleave the runs a few times and keep the best of each to smooth out noise
+    times = {name: [] for name in runs}
+    for x in range(5):
+        for name, f in runs.items():
+            times[name].append(timeit(lambda: [f(v) for v in sources], number=1))
+    baseline = min(times['dijkstra.shortest_paths (heapq list)'])
+
+    print(f"""
+Priority Queues for Dijkstra on {len(graph)} intersections in Ann Arbor, MI (whole meters, max edge {max_weight} m)
+""")
+    for name, t in times.items():
+        print(f'* {name} = {min(t) / len(sources) * 1000:.3f} ms per query ({baseline / min(t):.2f}x)')
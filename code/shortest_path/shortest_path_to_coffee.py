@@ -6,16 +6,13 @@ case, finding the best way to walk to local coffee shops in Ann Arbor, MI.
 OpenStreetMap of Ann Arbor, MI
 https://www.openstreetmap.org/export#map=15/42.2758/-83.7501
 """
-import gzip
-from xml.sax import parse
-from xml.sax.handler import ContentHandler
-
-from openstreetmap import graph_from_openstreetmap
+from graph_file import graph_from_openstreetmap_cached
 from dijkstra import shortest_paths, print_path
+from nearest import nearest_facilities
 
 
-# load Ann Arbor as a graph
-graph = graph_from_openstreetmap(gzip.open('openstreetmap_ann_arbor_mi.xml.gz'))
+# load Ann Arbor as a graph, parsed on the first run and read from a cache file after
+graph = graph_from_openstreetmap_cached('openstreetmap_ann_arbor_mi.xml.gz')
 
 # find all paths from your starting location
 start = ('Crest Avenue', 'West Washington Street')
@@ -33,3 +30,13 @@ print_path(paths, start, (u'Miller Avenue', u'Spring Street'))
 # Jefferson Cakery
 print("\nJefferson Cakery @ ('Fifth Street', 'West Jefferson Street')")
 print_path(paths, start, (u'Fifth Street', u'West Jefferson Street'))
+
+# Or let the search find the nearest coffee shops, stopping once the first two are found
+cafes = {
+    (u'Second Street', u'West Liberty Street'): 'Argus',
+    (u'Miller Avenue', u'Spring Street'): 'Big City Small World Bakery',
+    (u'Fifth Street', u'West Jefferson Street'): 'Jefferson Cakery',
+}
+print('\nNearest two coffee shops')
+for route in nearest_facilities(graph, start, cafes, k=2):
+    print(f'{cafes[route.path[-1]]} = {route.distance:.4f}, {len(route.path)} intersections')
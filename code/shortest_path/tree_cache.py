@@ -0,0 +1,234 @@
+"""LRU cache of shortest path trees, keyed by (graph version, source)
+
+`shortest_paths` finds the shortest path from one source to every vertex at once, which
+is a tree of `{vertex: (distance, previous vertex)}`. Routing traffic tends to come in
+bursts from a few popular origins, so keeping recent trees around answers any
+destination from a repeated source without searching again.
+
+* Trees are evicted least recently used first once the cache is over `max_bytes`
+* Keys include `graph.version` and a graph with a new version clears the cache, so a
+  rebuilt graph never serves routes from the old one
+* Edges changed in place (see `Graph.set_weight`) only drop the trees they affect. A
+  slower or disabled edge only matters to trees that use it. A faster or re-enabled
+  edge only matters to trees where it makes a shorter path to its end.
+* `hits`, `misses`, `evictions`, `invalidations` and `hit_rate` show how well the cache
+  is doing
+
+ShortestPathCache.route
+  * Time = O(L) on a hit for a path of L vertices, O((V + E) log V) on a miss
+  * Memory = O(V) per cached tree
+"""
+import sys
+from collections import OrderedDict
+
+from dijkstra import Route, shortest_paths, path_to
+
+
+# bytes per tree entry, a (distance, previous vertex) tuple and the float distance
+_ENTRY_BYTES = sys.getsizeof((0.0, None)) + sys.getsizeof(0.0)
+
+
+def tree_bytes(paths):
+    """Rough size of a shortest path tree, not counting the vertices it shares with the graph"""
+    return sys.getsizeof(paths) + len(paths) * _ENTRY_BYTES
+
+
+def affected(paths, v_start, change):
+    """True if an edge change from `Graph.changes` can change the tree from `v_start`
+
+    >>> paths = {'B': (4, 'A'), 'C': (2, 'A')}
+    >>> affected(paths, 'A', ('A', 'B', 4, 5)), affected(paths, 'A', ('C', 'B', 6, 5))
+    (True, False)
+    >>> affected(paths, 'A', ('C', 'B', 6, 1)), affected(paths, 'A', ('B', 'C', 9, 8))
+    (True, False)
+    """
+    v_src, v_dst, old, new = change
+    if new > old:
+        # longer only matters if the tree goes through this edge
+        return v_dst != v_start and v_dst in paths and paths[v_dst][1] == v_src
+    if v_src == v_start:
+        dist_src = 0
+    elif v_src in paths:
+        dist_src = paths[v_src][0]
+    else:
+        return False
+    # shorter only matters if it is now the shortest way to `v_dst`
+    return v_dst != v_start and (v_dst not in paths or dist_src + new < paths[v_dst][0])
+
+
+class ShortestPathCache:
+    """Shortest path trees for recently used sources
+
+    Only trees for one graph version are kept at a time, the one most recently asked for.
+
+    >>> from openstreetmap import Graph
+    >>> graph = Graph()
+    >>> graph.update({'A': [('B', 4), ('C', 2)], 'B': [('D', 10)], 'C': [('D', 3)], 'D': []})
+    >>> cache = ShortestPathCache()
+    >>> cache.route(graph, 'A', 'D')
+    Route(distance=5, path=['A', 'C', 'D'], settled=3)
+    >>> cache.route(graph, 'A', 'B').distance, cache.route(graph, 'B', 'D').distance
+    (4, 10)
+    >>> cache.route(graph, 'D', 'A') is None
+    True
+    >>> cache.hits, cache.misses, cache.hit_rate
+    (1, 3, 0.25)
+
+    A rebuilt graph gets a new version, which drops the old trees
+
+    >>> rebuilt = Graph()
+    >>> rebuilt.update(graph)
+    >>> len(cache.trees), cache.route(rebuilt, 'A', 'D').distance, len(cache.trees)
+    (3, 5, 1)
+
+    Changing an edge only drops the trees that it affects
+
+    >>> cache.route(rebuilt, 'B', 'D').distance, cache.route(rebuilt, 'C', 'D').distance
+    (10, 3)
+    >>> rebuilt.set_weight('B', 'D', 12)
+    >>> cache.route(rebuilt, 'C', 'D'), cache.invalidations
+    (Route(distance=3, path=['C', 'D'], settled=1), 1)
+    >>> cache.route(rebuilt, 'B', 'D').distance
+    12
+
+    Falling further behind than the graph's log of changes drops every tree
+
+    >>> from collections import deque
+    >>> rebuilt.changes = deque(maxlen=2)
+    >>> for dist in (13, 14, 15):
+    ...     rebuilt.set_weight('B', 'D', dist)
+    >>> cache.route(rebuilt, 'C', 'D').distance, len(cache.trees)
+    (3, 1)
+    """
+    def __init__(self, max_bytes=64 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.trees = OrderedDict()
+        self.bytes = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # the graph's `revision` that the cached trees are up to date with
+        self.changes_seen = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        """Drops every cached tree, e.g. after the graph was rebuilt"""
+        self.trees.clear()
+        self.bytes = 0
+
+    def paths(self, graph, v_start):
+        """Returns the `shortest_paths` tree from `v_start`, searching only on a miss"""
+        if graph.version != self.version:
+            self.clear()
+            self.version = graph.version
+            self.changes_seen = graph.revision
+        elif self.changes_seen < graph.revision:
+            missed = graph.revision - self.changes_seen
+            if missed > len(graph.changes):
+                # older changes already fell off the graph's log, start over
+                self.clear()
+            else:
+                self._invalidate(list(graph.changes)[-missed:])
+            self.changes_seen = graph.revision
+
+        key = (graph.version, v_start)
+        paths = self.trees.get(key)
+        if paths is not None:
+            self.hits += 1
+            self.trees.move_to_end(key)
+            return paths
+
+        self.misses += 1
+        paths = shortest_paths(graph, v_start)
+        self.trees[key] = paths
+        self.bytes += tree_bytes(paths)
+        # always keep the newest tree, even if it alone is over the cap
+        while self.bytes > self.max_bytes and len(self.trees) > 1:
+            _, evicted = self.trees.popitem(last=False)
+            self.bytes -= tree_bytes(evicted)
+            self.evictions += 1
+        return paths
+
+    def _invalidate(self, changes):
+        """Drops only the trees affected by the edge changes"""
+        for key, paths in list(self.trees.items()):
+            _, v_start = key
+            if any(affected(paths, v_start, change) for change in changes):
+                del self.trees[key]
+                self.bytes -= tree_bytes(paths)
+                self.invalidations += 1
+
+    def route(self, graph, v_start, v_end):
+        """Finds the shortest path between two vertices using the cached tree from `v_start`
+
+        Returns a `Route`, with `settled` being the size of the whole tree, or None if
+        `v_end` can't be reached from `v_start`.
+        """
+        paths = self.paths(graph, v_start)
+        if v_end == v_start:
+            return Route(0, [v_start], len(paths))
+        if v_end not in paths:
+            return None
+        return Route(paths[v_end][0], path_to(paths, v_start, v_end), len(paths))
+
+
+if __name__ == '__main__':
+    import gzip
+    import random
+    import time
+
+    from openstreetmap import graph_from_openstreetmap
+    from dijkstra import shortest_path
+
+    graph = graph_from_openstreetmap(gzip.open('openstreetmap_ann_arbor_mi.xml.gz'))
+
+    # bursty traffic, most queries start from a handful of popular origins
+    random.seed(0)
+    vertices = list(graph)
+    origins = random.sample(vertices, 50)
+    weights = [1 / (rank + 1) for rank in range(len(origins))]
+    queries = [(random.choices(origins, weights)[0], random.choice(vertices)) for x in range(2000)]
+
+    start = time.perf_counter()
+    uncached = [shortest_path(graph, v_start, v_end) for v_start, v_end in queries]
+    uncached_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+    cache = ShortestPathCache(max_bytes=20 * tree_bytes(shortest_paths(graph, origins[0])))
+    start = time.perf_counter()
+    cached = [cache.route(graph, v_start, v_end) for v_start, v_end in queries]
+    cached_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+    for a, b in zip(uncached, cached):
+        assert (a is None) == (b is None)
+        assert a is None or abs(a.distance - b.distance) < 1e-9
+    stats = f"""* Cached trees = {len(cache.trees)}, {cache.bytes / 2 ** 20:.1f} MB of {cache.max_bytes / 2 ** 20:.1f} MB
+* Hits = {cache.hits}, misses = {cache.misses}, evictions = {cache.evictions}, hit rate = {cache.hit_rate:.1%}"""
+
+    # random slowdowns and closures, after each the same sources are looked up again
+    edges = [(v_src, v_dst) for v_src in graph for v_dst, _ in graph[v_src]]
+    sources = [v_start for _, v_start in cache.trees]
+    for x in range(100):
+        v_src, v_dst = random.choice(edges)
+        if (v_src, v_dst) in graph.disabled:
+            graph.enable_edge(v_src, v_dst)
+        elif random.random() < 0.5:
+            graph.disable_edge(v_src, v_dst)
+        else:
+            graph.set_weight(v_src, v_dst, dict(graph[v_src])[v_dst] * 2)
+        for v_start in sources:
+            cache.paths(graph, v_start)
+
+    print(f"""
+Shortest Path Tree Cache for {len(queries)} queries from {len(origins)} origins in Ann Arbor, MI
+
+* shortest_path (no cache) = {uncached_ms:.3f} ms per query
+* ShortestPathCache = {cached_ms:.3f} ms per query
+{stats}
+* {graph.revision} edge changes dropped {cache.invalidations / graph.revision:.2f} of {len(sources)} cached trees per change
+""")
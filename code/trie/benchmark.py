@@ -0,0 +1,174 @@
+"""
+Benchmark and memory profiling harness for the DNA trie variants
+
+Generates synthetic read sets and times build, compress, tally, `calculate_fraction`
+and prefix queries for each trie variant. Prefix queries (`count_prefix`) only exist in
+trie_dna_optimized.py and show as `-` for the other variants. Every (variant, read set) case runs in a freshly spawned process so
+that its peak RSS isn't polluted by earlier cases. Results are printed as a table and
+can be written as JSON lines (one object per case) to track over releases.
+
+Variants:
+
+* `trie_dna` = trie_dna.py
+* `optimized` = trie_dna_optimized.py, uncompressed
+* `compressed` = trie_dna_optimized.py, compressed
+* `packed` = trie_dna_optimized.py, compressed with 2-bit packed paths
+* `flat` = trie_dna_flat.py
+
+Read sets:
+
+* `random` = uniformly random A, C, G and T reads
+* `repeat` = FragileX-like CGG repeats with some G's miscalled as N's
+
+Example, all variants for 1e3-1e5 reads of both kinds:
+
+  python benchmark.py --reads 1000,10000,100000 --output results.jsonl
+
+The larger scales (1e6-1e7 reads) take a long time and a lot of memory for the
+object-based variants. Pick variants with `--variants compressed,flat`.
+"""
+import argparse
+import json
+import platform
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import trie_dna
+import trie_dna_flat
+import trie_dna_optimized
+
+
+VARIANTS = ('trie_dna', 'optimized', 'compressed', 'packed', 'flat')
+KINDS = ('random', 'repeat')
+# character sets asked of `calculate_fraction`, in turn
+FRACTIONS = ({'C', 'G'}, {'A'}, {'A', 'T'}, {'N'}, {'A', 'C', 'G', 'T'})
+
+
+def make_reads(kind, num_reads, read_length, seed=0):
+    """Makes a reproducible list of synthetic reads
+
+    >>> make_reads('random', 2, 8)
+    ['TTCCGCTC', 'CGTGCTGC']
+    >>> make_reads('repeat', 2, 8)
+    ['CGGCGGCG', 'CGGCGNCG']
+    """
+    rnd = random.Random(seed)
+    if kind == 'random':
+        return [''.join(rnd.choices('ACGT', k=read_length)) for x in range(num_reads)]
+    if kind == 'repeat':
+        mostly_g = ['G', 'G', 'N']
+        return [
+            ''.join(['CG' + rnd.choice(mostly_g) for x in range(read_length // 3 + 1)])[:read_length]
+            for x in range(num_reads)]
+    raise ValueError(f'Unknown read set kind: {kind}')
+
+def _peak_rss_bytes():
+    """Peak resident set size of this process. Linux reports KB, macOS reports bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _timed(f, *args):
+    start = time.perf_counter()
+    result = f(*args)
+    return result, time.perf_counter() - start
+
+def run_case(variant, kind, num_reads, read_length, num_queries, seed=0, num_fractions=10):
+    """Runs one benchmark case and returns its results as a dict
+
+    Times are in seconds. Steps a variant doesn't support (e.g. compressing `trie_dna`
+    or `count_prefix` outside of trie_dna_optimized.py) are None.
+    """
+    reads = make_reads(kind, num_reads, read_length, seed)
+    rnd = random.Random(seed + 1)
+    prefixes = [rnd.choice(reads)[:rnd.randint(1, 12)] for x in range(num_queries)]
+    rss_before = _peak_rss_bytes()
+
+    compress_seconds = query_seconds = None
+    if variant == 'trie_dna':
+        module = trie_dna
+        trie, build_seconds = _timed(trie_dna.make_trie, reads)
+        tallies, tally_seconds = _timed(trie_dna.tally_iterative, trie)
+    elif variant == 'flat':
+        module = trie_dna_flat
+        trie, build_seconds = _timed(trie_dna_flat.make_trie, reads)
+        tallies, tally_seconds = _timed(trie_dna_flat.tally, trie)
+    else:
+        module = trie_dna_optimized
+        trie, build_seconds = _timed(trie_dna_optimized.make_trie, reads, False)
+        if variant in ('compressed', 'packed'):
+            _, compress_seconds = _timed(trie_dna_optimized._compress, trie)
+        if variant == 'packed':
+            _, pack_seconds = _timed(trie_dna_optimized._pack, trie)
+            compress_seconds += pack_seconds
+        tallies, tally_seconds = _timed(trie_dna_optimized.tally_iterative, trie)
+        _, query_seconds = _timed(
+            lambda: [trie_dna_optimized.count_prefix(trie, p) for p in prefixes])
+
+    # every variant answers the challenge itself, some by walking the whole trie each time
+    fractions, fraction_seconds = _timed(
+        lambda: [module.calculate_fraction(trie, FRACTIONS[i % len(FRACTIONS)]) for i in range(num_fractions)])
+
+    return {
+        'variant': variant,
+        'kind': kind,
+        'reads': num_reads,
+        'read_length': read_length,
+        'queries': num_queries,
+        'fractions': num_fractions,
+        'build_seconds': build_seconds,
+        'compress_seconds': compress_seconds,
+        'tally_seconds': tally_seconds,
+        'fraction_seconds': fraction_seconds,
+        'query_seconds': query_seconds,
+        'peak_rss_bytes': _peak_rss_bytes(),
+        'rss_growth_bytes': _peak_rss_bytes() - rss_before,
+        'tallies': list(tallies),
+        'fraction_results': fractions[:len(FRACTIONS)],
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+    }
+
+def _seconds(x):
+    return '-' if x is None else f'{x:.3f}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the DNA trie variants')
+    parser.add_argument('--reads', default='1000,10000', help='comma separated read set sizes, e.g. 1000,10000000')
+    parser.add_argument('--kinds', default=','.join(KINDS), help='comma separated read set kinds')
+    parser.add_argument('--variants', default=','.join(VARIANTS), help='comma separated trie variants')
+    parser.add_argument('--read-length', type=int, default=100)
+    parser.add_argument('--queries', type=int, default=1000, help='number of prefix queries')
+    parser.add_argument('--fractions', type=int, default=10, help='number of calculate_fraction calls')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='append JSON lines results to this file')
+    args = parser.parse_args()
+
+    print(f"{'variant':<12}{'kind':<8}{'reads':>10}{'build s':>10}{'compress s':>12}{'tally s':>10}{'fraction s':>12}{'query s':>10}{'peak RSS MB':>13}")
+    output = open(args.output, 'a') if args.output else None
+    for num_reads in (int(float(x)) for x in args.reads.split(',')):
+        for kind in args.kinds.split(','):
+            for variant in args.variants.split(','):
+                # a new process per case keeps peak RSS of one case from leaking in to the next
+                with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as pool:
+                    result = pool.submit(
+                        run_case, variant, kind, num_reads, args.read_length, args.queries, args.seed,
+                        args.fractions).result()
+
+                print(f"{variant:<12}{kind:<8}{num_reads:>10}"
+                      f"{_seconds(result['build_seconds']):>10}{_seconds(result['compress_seconds']):>12}"
+                      f"{_seconds(result['tally_seconds']):>10}{_seconds(result['fraction_seconds']):>12}"
+                      f"{_seconds(result['query_seconds']):>10}"
+                      f"{result['peak_rss_bytes'] / 2 ** 20:>13.1f}")
+                if output:
+                    output.write(json.dumps(result) + '\n')
+                    output.flush()
+    if output:
+        output.close()
+    print(f"\n{args.fractions} calculate_fraction calls and {args.queries} count_prefix queries per case,"
+          " '-' = not supported by the variant")
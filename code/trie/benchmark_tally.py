@@ -0,0 +1,62 @@
+"""
+Helper script to compare the recursive, generator-based `tally` against the explicit
+stack-based `tally_iterative` using the FragileX-like inputs from memory_usage_optimized.py
+"""
+import random
+from timeit import timeit
+
+import trie_dna
+import trie_dna_optimized
+
+
+# mock up FragileX-like CGG repeats assuming some G's are miscalled as N's due to repeats
+random.seed(0)
+mostly_g = ['G', 'G', 'N']
+repetitive_sequences = [
+    ''.join(['CG' + random.choice(mostly_g) for x in range(50)])
+    for x in range(100)
+]
+
+fx_unoptimized = trie_dna.make_trie(repetitive_sequences)
+fx_optimized = trie_dna_optimized.make_trie(repetitive_sequences, compress=False)
+fx_optimized_compressed = trie_dna_optimized.make_trie(repetitive_sequences)
+fx_optimized_packed = trie_dna_optimized.make_trie(repetitive_sequences, packed=True)
+
+# both versions must agree before timing means anything
+assert tuple(trie_dna.tally(fx_unoptimized)) == trie_dna.tally_iterative(fx_unoptimized)
+assert tuple(trie_dna_optimized.tally(fx_optimized)) == trie_dna_optimized.tally_iterative(fx_optimized)
+assert tuple(trie_dna_optimized.tally(fx_optimized_compressed)) == trie_dna_optimized.tally_iterative(fx_optimized_compressed)
+assert tuple(trie_dna_optimized.tally(fx_optimized_packed)) == trie_dna_optimized.tally_iterative(fx_optimized_packed)
+
+
+def compare(name, module, trie, number=20):
+    recursive = timeit(lambda: tuple(module.tally(trie)), number=number) / number
+    iterative = timeit(lambda: module.tally_iterative(trie), number=number) / number
+    return f'* {name} = {recursive * 1000:.2f} ms vs {iterative * 1000:.2f} ms ({recursive / iterative:.1f}x)'
+
+
+# a single long repeat expansion is deeper than Python's default recursion limit
+deep = trie_dna_optimized.make_trie(['CGG' * 1000], compress=False)
+try:
+    tuple(trie_dna_optimized.tally(deep))
+    deep_recursive = 'ok'
+except RecursionError:
+    deep_recursive = 'RecursionError'
+deep_iterative = trie_dna_optimized.tally_iterative(deep)
+
+
+print(f"""
+Tally Time Per Trie (tally vs tally_iterative)
+
+FragileX-like Repetitive Sequences
+
+{compare('Unoptimized (trie_dna.py)', trie_dna, fx_unoptimized)}
+{compare('Optimized (trie_dna_optimized.py)', trie_dna_optimized, fx_optimized)}
+{compare('Optimized Compressed (trie_dna_optimized.py)', trie_dna_optimized, fx_optimized_compressed)}
+{compare('Optimized Compressed 2-bit Packed (trie_dna_optimized.py)', trie_dna_optimized, fx_optimized_packed)}
+
+3000bp CGG Repeat (trie_dna_optimized.py, uncompressed)
+
+* tally = {deep_recursive}
+* tally_iterative = {deep_iterative}
+""")
@@ -0,0 +1,194 @@
+"""
+Streams reads from FASTA/FASTQ files (plain or gzip) into a trie_dna_optimized trie
+
+`trie_dna_optimized.make_trie` takes a list, which means every read of a multi-GB FASTQ
+has to be in memory before the trie is even started. This reads the file lazily, one
+record at a time, and adds reads to the trie in chunks. Optionally the trie is
+compressed after every `compress_every` reads and new reads are added with
+`add_word(..., compress=True)`, so the uncompressed part of the trie never grows
+past roughly one chunk of reads.
+
+Run with `python load_reads.py reads.fastq.gz` to see throughput for a file.
+"""
+import gzip
+import sys
+import time
+from collections import namedtuple
+from itertools import islice
+
+import trie_dna_optimized
+
+
+LoadStats = namedtuple('LoadStats', 'reads bases seconds reads_per_sec bases_per_sec')
+
+
+def _open(path):
+    """Opens a plain text or gzip file, using the gzip magic bytes rather than the name"""
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    if magic == b'\x1f\x8b':
+        return gzip.open(path, 'rt')
+    return open(path, 'rt')
+
+# deletes the bases a trie can hold, anything left over is invalid
+_BASES = str.maketrans('', '', 'ACGTN')
+
+def _checked(sequence, kind, record):
+    """Upper cases a sequence, raising ValueError if it has bases other than A, C, G, T or N"""
+    sequence = sequence.upper()
+    invalid = sequence.translate(_BASES)
+    if invalid:
+        raise ValueError(f"{kind} record {record} has invalid bases {''.join(sorted(set(invalid)))!r}, expected A, C, G, T or N")
+    return sequence
+
+def _sequences(lines):
+    """Yields sequences from FASTA or FASTQ lines, detected by the first header character
+
+    Blank lines between records are skipped.
+
+    >>> list(_sequences(['>r1', 'ACGT', 'TTAA', '', '>r2', 'cc']))
+    ['ACGTTTAA', 'CC']
+    >>> list(_sequences(['@r1', 'ACGT', '+', 'IIII', '', '@r2', 'GGN', '+r2', '@@@', '']))
+    ['ACGT', 'GGN']
+    >>> list(_sequences(['@r1', 'ACGT', '+', 'IIII', '@r2', 'GGN', '@@@', '+']))
+    Traceback (most recent call last):
+    ...
+    ValueError: FASTQ record 2 has no '+' separator line
+    >>> list(_sequences(['@r1', 'ACGT', '+', 'IIII', 'GGN', '+r2', '@@@']))
+    Traceback (most recent call last):
+    ...
+    ValueError: FASTQ record 2 has no '@' header line
+    >>> list(_sequences(['ACGT', '>r2', 'GGN']))
+    Traceback (most recent call last):
+    ...
+    ValueError: FASTA record 1 has no '>' header line
+    >>> list(_sequences(['>r1', 'ACGT', '>r2', 'GRN.']))
+    Traceback (most recent call last):
+    ...
+    ValueError: FASTA record 2 has invalid bases '.R', expected A, C, G, T or N
+    """
+    lines = (line.rstrip() for line in lines)
+    for header in lines:
+        if header:
+            break
+    else:
+        return
+
+    # FASTQ is four lines per read. The quality line can start with '@' so it has to be
+    # skipped by position, not by looking for the next header. Checking the '@' and '+'
+    # lines catches a malformed or misaligned file instead of reading garbage.
+    if header.startswith('@'):
+        record = 1
+        while header is not None:
+            if not header.startswith('@'):
+                raise ValueError(f"FASTQ record {record} has no '@' header line")
+            sequence = next(lines, '')
+            if not next(lines, '').startswith('+'):
+                raise ValueError(f"FASTQ record {record} has no '+' separator line")
+            next(lines, None)
+            yield _checked(sequence, 'FASTQ', record)
+            record += 1
+            header = next(lines, None)
+            while header == '':
+                header = next(lines, None)
+        return
+
+    if not header.startswith('>'):
+        raise ValueError("FASTA record 1 has no '>' header line")
+
+    # FASTA sequences may be wrapped over many lines
+    record = 1
+    sequence = []
+    for line in lines:
+        if line.startswith('>'):
+            yield _checked(''.join(sequence), 'FASTA', record)
+            sequence = []
+            record += 1
+        elif line:
+            sequence.append(line)
+    yield _checked(''.join(sequence), 'FASTA', record)
+
+def read_sequences(path):
+    """Lazily yields each read's sequence from a FASTA or FASTQ file, plain or gzip"""
+    with _open(path) as f:
+        yield from _sequences(f)
+
+def add_words(trie, words, chunk_size=100000, compress_every=None, progress=None):
+    """Adds words from any iterable to a trie in chunks, returning the throughput
+
+    If `compress_every` is set, the trie is compressed after about that many reads and
+    words are added with `add_word(..., compress=True)`. `progress` is called with the
+    LoadStats so far after every chunk.
+
+    >>> trie = trie_dna_optimized.make_trie([])
+    >>> stats = add_words(trie, ['CGGCGGA', 'CGGCGGC', 'CGAT'], chunk_size=2, compress_every=2)
+    >>> stats.reads, stats.bases
+    (3, 18)
+    >>> trie_dna_optimized.calculate_fraction(trie, {'C', 'G'})
+    0.8333333333333334
+    """
+    compress = compress_every is not None
+    reads = bases = since_compress = 0
+    start = time.perf_counter()
+    words = iter(words)
+
+    while True:
+        chunk = list(islice(words, chunk_size))
+        if not chunk:
+            break
+        for word in chunk:
+            trie_dna_optimized.add_word(trie, word, compress=compress)
+            bases += len(word)
+        reads += len(chunk)
+        since_compress += len(chunk)
+
+        if compress and since_compress >= compress_every:
+            trie_dna_optimized._compress(trie)
+            since_compress = 0
+
+        if progress:
+            progress(_stats(reads, bases, start))
+
+    if compress and since_compress:
+        trie_dna_optimized._compress(trie)
+
+    return _stats(reads, bases, start)
+
+def _stats(reads, bases, start):
+    seconds = time.perf_counter() - start
+    return LoadStats(
+        reads, bases, seconds,
+        reads / seconds if seconds else 0,
+        bases / seconds if seconds else 0)
+
+def make_trie_from_file(path, chunk_size=100000, compress_every=None, progress=None):
+    """Same as `trie_dna_optimized.make_trie` but streams reads from a FASTA/FASTQ file
+
+    Returns the trie and LoadStats with the read and base throughput.
+    """
+    trie = trie_dna_optimized.make_trie([])
+    stats = add_words(trie, read_sequences(path), chunk_size, compress_every, progress)
+    return trie, stats
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: python load_reads.py <reads.fasta|reads.fastq[.gz]> [compress_every]')
+        sys.exit(1)
+
+    compress_every = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    def report(stats):
+        print(f'{stats.reads} reads, {stats.reads_per_sec:.0f} reads/sec, {stats.bases_per_sec:.0f} bases/sec')
+
+    trie, stats = make_trie_from_file(sys.argv[1], compress_every=compress_every, progress=report)
+    print(f"""
+Loaded {sys.argv[1]}
+
+* Reads = {stats.reads}
+* Bases = {stats.bases}
+* Seconds = {stats.seconds:.2f}
+* Reads/sec = {stats.reads_per_sec:.0f}
+* Bases/sec = {stats.bases_per_sec:.0f}
+* GC fraction = {trie_dna_optimized.calculate_fraction(trie, {'G', 'C'}) if stats.bases else 0}
+""")
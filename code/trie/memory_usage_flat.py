@@ -0,0 +1,70 @@
+"""
+Helper script to compare memory usage of the flat, array-backed ptrie against the
+object-based tries in trie_dna.py and trie_dna_optimized.py
+"""
+import random
+
+import trie_dna
+import trie_dna_optimized
+import trie_dna_flat
+
+from pympler.asizeof import asized
+
+
+# smaller test sequences that were verfied by hand
+sequences = ['ACTG', 'AACT', 'TCAGG', 'ACTG', 'ACTG', 'GGCG', 'TTGGA']
+
+unoptimized = trie_dna.make_trie(sequences)
+optimized = trie_dna_optimized.make_trie(sequences, compress=False)
+optimized_compressed = trie_dna_optimized.make_trie(sequences)
+flat = trie_dna_flat.make_trie(sequences)
+
+
+# mock up FragileX-like CGG repeats assuming some G's are miscalled as N's due to repeats
+mostly_g = ['G', 'G', 'N']
+repetitive_sequences = [
+    ''.join(['CG' + random.choice(mostly_g) for x in range(50)])
+    for x in range(100)
+]
+
+fx_unoptimized = trie_dna.make_trie(repetitive_sequences)
+fx_optimized = trie_dna_optimized.make_trie(repetitive_sequences, compress=False)
+fx_optimized_compressed = trie_dna_optimized.make_trie(repetitive_sequences)
+fx_flat = trie_dna_flat.make_trie(repetitive_sequences)
+
+
+# random reads of a fixed length are closer to a real sequencing run
+random_sequences = [
+    ''.join(random.choice('ACGT') for x in range(100))
+    for x in range(1000)
+]
+
+rnd_unoptimized = trie_dna.make_trie(random_sequences)
+rnd_optimized = trie_dna_optimized.make_trie(random_sequences, compress=False)
+rnd_optimized_compressed = trie_dna_optimized.make_trie(random_sequences)
+rnd_flat = trie_dna_flat.make_trie(random_sequences)
+
+
+print(f"""
+Memory Usage Per Data Structure
+
+* Unoptimized (trie_dna.py) = {asized(unoptimized).size}
+* Optimized (trie_dna_optimized.py) = {asized(optimized).size}
+* Optimized Compressed (trie_dna_optimized.py) = {asized(optimized_compressed).size}
+* Flat (trie_dna_flat.py) = {asized(flat).size}
+
+FragileX-like Repetitive Sequence Memory Savings
+
+* Unoptimized (trie_dna.py) = {asized(fx_unoptimized).size}
+* Optimized (trie_dna_optimized.py) = {asized(fx_optimized).size}
+* Optimized Compressed (trie_dna_optimized.py) = {asized(fx_optimized_compressed).size}
+* Flat (trie_dna_flat.py) = {asized(fx_flat).size}
+
+Random 100bp Reads (mostly non-branching, worst case for per-node objects)
+
+* Unoptimized (trie_dna.py) = {asized(rnd_unoptimized).size}
+* Optimized (trie_dna_optimized.py) = {asized(rnd_optimized).size}
+* Optimized Compressed (trie_dna_optimized.py) = {asized(rnd_optimized_compressed).size}
+* Flat (trie_dna_flat.py) = {asized(rnd_flat).size}
+
+""")
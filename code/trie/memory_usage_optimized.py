@@ -27,6 +27,7 @@ repetitive_sequences = [
 fx_unoptimized = trie_dna.make_trie(repetitive_sequences)
 fx_optimized = trie_dna_optimized.make_trie(repetitive_sequences, compress=False)
 fx_optimized_compressed = trie_dna_optimized.make_trie(repetitive_sequences)
+fx_optimized_packed = trie_dna_optimized.make_trie(repetitive_sequences, packed=True)
 
 
 print(f"""
@@ -41,5 +42,6 @@ FragileX-like Repetitive Sequence Memory Savings (aka using "Compressed" mode)
 * Unoptimized (trie_dna.py) = {asized(fx_unoptimized).size}
 * Optimized (trie_dna_optimized.py) = {asized(fx_optimized).size}
 * Optimized Compressed (trie_dna_optimized.py) = {asized(fx_optimized_compressed).size}
+* Optimized Compressed 2-bit Packed (trie_dna_optimized.py) = {asized(fx_optimized_packed).size}
 
 """)
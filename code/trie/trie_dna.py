@@ -73,6 +73,37 @@ def tally(n, num_a=0, num_c=0, num_g=0, num_t=0, num_n=0):
 
     return tallies
 
+def tally_iterative(trie):
+    """Tallies character frequency via an explicit depth-first stack instead of recursion
+
+    Each stack entry is a node plus how many of each character are on the path to it.
+    See `trie_dna_optimized.tally_iterative` for the version that handles compression.
+
+    >>> tally_iterative(make_trie(['ACTG', 'AACT', 'TCAGG', 'TTGGA']))
+    (5, 3, 5, 5, 0)
+    """
+    num_a = num_c = num_g = num_t = num_n = 0
+    stack = [(trie, 0, 0, 0, 0, 0)]
+    while stack:
+        node, a, c, g, t, n = stack.pop()
+        if node.count:
+            num_a += a * node.count
+            num_c += c * node.count
+            num_g += g * node.count
+            num_t += t * node.count
+            num_n += n * node.count
+        if node.A:
+            stack.append((node.A, a + 1, c, g, t, n))
+        if node.C:
+            stack.append((node.C, a, c + 1, g, t, n))
+        if node.G:
+            stack.append((node.G, a, c, g + 1, t, n))
+        if node.T:
+            stack.append((node.T, a, c, g, t + 1, n))
+        if node.N:
+            stack.append((node.N, a, c, g, t, n + 1))
+    return num_a, num_c, num_g, num_t, num_n
+
 
 def calculate_fraction(trie, characters):
     """
@@ -101,7 +132,7 @@ def calculate_fraction(trie, characters):
     0.5333333333333333
     """
     # total of each character based on iterating through the trie
-    num_a, num_c, num_g, num_t, num_n = tally(trie)
+    num_a, num_c, num_g, num_t, num_n = tally_iterative(trie)
 
     numerator = sum(
         [x if y in characters else 0
@@ -0,0 +1,159 @@
+"""
+ptrie stored as flat integer columns instead of one Python object per node
+
+`trie_dna_optimized.py` still allocates a `Node` or `NodeWithCount` (88-120 bytes) for
+every prefix in the trie. For tens of millions of reads that runs out of memory before
+`_compress` ever gets a chance to shrink things. This version drops per-node objects
+entirely:
+
+0. Each node is an integer ID. The root is always ID 0.
+
+1. Children are stored as five `array('I')` columns, one per character in the alphabet
+   A, C, G, T and N. `trie.A[n]` is the ID of the child reached from node `n` by an
+   `A` or 0 if there is no such child. 0 can be used as the "no child" marker since the
+   root is never anyone's child.
+
+2. How many sequences ended on each node is kept in a parallel `array('I')` column.
+
+This is 6 * 4 = 24 bytes per node versus 88-120 bytes for the object-based nodes. See
+`memory_usage_flat.py` for a comparison against `trie_dna.py` and `trie_dna_optimized.py`.
+
+Nodes are only ever appended, so a child always has a larger ID than its parent. `tally`
+relies on this to total up the trie in a single backwards pass without any recursion.
+"""
+from array import array
+
+
+class FlatTrie:
+    """Column-oriented trie. Row `n` of every column describes node ID `n`"""
+    __slots__ = 'A', 'C', 'G', 'T', 'N', 'count'
+    def __init__(self):
+        # row 0 is the root node
+        self.A = array('I', [0])
+        self.C = array('I', [0])
+        self.G = array('I', [0])
+        self.T = array('I', [0])
+        self.N = array('I', [0])
+        self.count = array('I', [0])
+
+    def __len__(self):
+        """Number of nodes in the trie, including the root"""
+        return len(self.count)
+
+
+def _new_node(trie):
+    """Appends an empty row to every column and returns the new node's ID"""
+    for column in (trie.A, trie.C, trie.G, trie.T, trie.N, trie.count):
+        column.append(0)
+    return len(trie.count) - 1
+
+def add_word(trie, word):
+    """Adds a word/sequence to the given trie"""
+    # start at the root node and add each letter
+    n = 0
+    for c in word:
+        column = getattr(trie, c)
+        child = column[n]
+        if not child:
+            child = _new_node(trie)
+            column[n] = child
+        n = child
+    trie.count[n] += 1
+
+def make_trie(words):
+    """Create a flat trie from the given words (DNA sequences)
+
+    It is assumed that each word consists of only A, C, G, T and N. No error handling
+    for case sensitivity or unexpected characters is done.
+
+    >>> trie = make_trie(['ACTG', 'ACTA'])
+    >>> len(trie)
+    6
+    >>> list(trie.count)
+    [0, 0, 0, 0, 1, 1]
+    """
+    trie = FlatTrie()
+    for word in words:
+        add_word(trie, word)
+    return trie
+
+def tally(trie):
+    """Tallies the frequency of A, C, G, T and N in one backwards pass over the nodes
+
+    Children always have larger IDs than their parents, so walking the IDs from last to
+    first sees every child before its parent. `below[n]` is how many sequences ended on
+    `n` or any node under it, which is also how many times the edge into `n` was used.
+
+    >>> tally(make_trie(['ACTG', 'AACT', 'TCAGG', 'TTGGA']))
+    (5, 3, 5, 5, 0)
+    """
+    A, C, G, T, N, count = trie.A, trie.C, trie.G, trie.T, trie.N, trie.count
+    below = array('Q', count)
+    num_a = num_c = num_g = num_t = num_n = 0
+    for n in range(len(count) - 1, -1, -1):
+        total = below[n]
+        child = A[n]
+        if child:
+            num_a += below[child]
+            total += below[child]
+        child = C[n]
+        if child:
+            num_c += below[child]
+            total += below[child]
+        child = G[n]
+        if child:
+            num_g += below[child]
+            total += below[child]
+        child = T[n]
+        if child:
+            num_t += below[child]
+            total += below[child]
+        child = N[n]
+        if child:
+            num_n += below[child]
+            total += below[child]
+        below[n] = total
+    return num_a, num_c, num_g, num_t, num_n
+
+
+def calculate_fraction(trie, characters):
+    """
+    Same as `trie_dna_optimized.calculate_fraction` but for the flat trie.
+
+    Run with `python -m doctest trie_dna_flat.py`
+
+    # edge case where no input is provided
+    >>> calculate_fraction(make_trie([]), {'A'})
+    Traceback (most recent call last):
+     ...
+    ValueError: Can not estimate frequency if no sequences are provided
+
+    # very small trie to smoke test things
+    >>> calculate_fraction(make_trie(['A', 'C', 'T', 'G']), {'A'})
+    0.25
+
+    # manually calculated test case #1 with 8/18 being C's or G's
+    >>> calculate_fraction(make_trie(['ACTG', 'AACT', 'TCAGG', 'TTGGA']), {'G', 'C'})
+    0.4444444444444444
+
+    # manually calculated test case #2 with 16/30 being C's or G'
+    >>> calculate_fraction(make_trie(['ACTG', 'AACT', 'TCAGG', 'ACTG', 'ACTG', 'GGCG', 'TTGGA']), {'C', 'G'})
+    0.5333333333333333
+
+    # manually calculated test case #3 with 32/35 being C's or G's
+    >>> calculate_fraction(make_trie(['CGGCGGA', 'CGGCGGC', 'CGGCGGG', 'CGGCGGT', 'CGGCGGN']), {'C', 'G'})
+    0.9142857142857143
+    """
+    # total of each character based on iterating through the trie
+    num_a, num_c, num_g, num_t, num_n = tally(trie)
+
+    numerator = sum(
+        [x if y in characters else 0
+         for (x, y) in [(num_a, 'A'), (num_c, 'C'), (num_g, 'G'), (num_t, 'T'), (num_n, 'N')]])
+    denominator = sum((num_a, num_c, num_g, num_t, num_n))
+
+    # return the fraction and protected against divide-by-zero
+    if not denominator:
+        raise ValueError("Can not estimate frequency if no sequences are provided")
+
+    return numerator / denominator
@@ -24,6 +24,12 @@ optimizations added to this version:
    b. `sys.intern` deduplicates memory usage for common strings. e.g. if `CGG` appears
       in many places in the graph, it is reduced to one instance in memory referenced
       by three different pointers.
+
+4. Optionally use `NodePacked` for long compressed paths. It stores 2 bits per base
+   instead of a full character, ~4x less memory for the sequence itself.
+
+5. `make_trie` returns a `NodeRoot` that keeps running totals of each character as
+   sequences are added. `calculate_fraction` is then O(1) and never walks the trie.
 """
 import sys
 from collections import deque
@@ -52,13 +58,36 @@ class NodeWithCount:
         self.G = G
         self.T = T
         self.N = N
-        self.count = 0
+        self.count = count
+
+class NodeRoot(Node):
+    """Root of the trie that also keeps a running total of every character added
+
+    `add_word` updates the totals as each sequence is inserted so that
+    `calculate_fraction` can answer any set of characters without a `tally`. `_compress`
+    and `merge` never replace the root itself, so the totals stay correct through
+    compression and later insertions.
+
+    `subtree_counts` caches how many sequences end under a node, keyed by `id(node)`,
+    for `count_prefix`. It holds an entry for every node counted so far, up to every
+    node in the trie (~70 bytes each). Anything that changes the trie resets it to None,
+    and setting it to None frees it.
+    """
+    __slots__ = 'num_a', 'num_c', 'num_g', 'num_t', 'num_n', 'subtree_counts'
+    def __init__(self, A=None, C=None, G=None, T=None, N=None):
+        super().__init__(A, C, G, T, N)
+        self.num_a = 0
+        self.num_c = 0
+        self.num_g = 0
+        self.num_t = 0
+        self.num_n = 0
+        self.subtree_counts = None
 
 class NodeCompressed:
     """Optimized representation of a non-branching path in the trie
 
-    This replaces paths of non-branching Node instances during a one-time call to
-    `_compress` after a trie is created. It can provide substantial memory savings
+    This replaces paths of non-branching Node instances during a call to `_compress`
+    after words are added to a trie. It can provide substantial memory savings
     since it converts many 120 byte objects (120 * N bytes) to a single object with a
     string (120 + N bytes).
 
@@ -70,6 +99,68 @@ class NodeCompressed:
         self.sequence = sequence
         self.next = next_node
 
+# A, C, G and T are 2 bit codes. N is stored as A and flagged in a separate bitmap.
+_PACK = str.maketrans('ACGTN', '01230')
+_UNPACK = [''.join('ACGT'[(b >> shift) & 3] for shift in (0, 2, 4, 6)) for b in range(256)]
+_N_MASK = str.maketrans('ACGTN', '00001')
+
+# lookup tables of how many of each code (or set bits) are in a byte, used with `bytes.translate`
+_COUNT_A, _COUNT_C, _COUNT_G, _COUNT_T = (
+    bytes(sum((b >> shift) & 3 == code for shift in (0, 2, 4, 6)) for b in range(256))
+    for code in range(4))
+_COUNT_BITS = bytes(bin(b).count('1') for b in range(256))
+
+class NodePacked(NodeCompressed):
+    """NodeCompressed with the sequence packed in to 2 bits per base
+
+    Four bases are stored per byte, first base in the lowest bits. N has no code of its
+    own so it is stored as A and flagged in the `n_mask` bitmap (None if there are no N).
+    Long runs use ~4x less memory than the `str` in NodeCompressed.
+
+    `sequence` decodes the bases for code that needs the characters, e.g. `add_word`
+    splitting the path. `base_counts` uses lookup tables instead so that `tally_iterative`
+    never decodes the sequence. The unused `sequence` slot from NodeCompressed costs 8
+    bytes but lets every `isinstance(n, NodeCompressed)` check keep working.
+    """
+    __slots__ = 'packed', 'length', 'n_mask'
+    def __init__(self, sequence, next_node):
+        # base 4 and base 2 numbers with the first base as the lowest digit
+        self.packed = int(sequence.translate(_PACK)[::-1], 4).to_bytes((len(sequence) + 3) // 4, 'little')
+        self.length = len(sequence)
+        self.n_mask = int(sequence.translate(_N_MASK)[::-1], 2).to_bytes((len(sequence) + 7) // 8, 'little') if 'N' in sequence else None
+        self.next = next_node
+
+    @property
+    def sequence(self):
+        sequence = ''.join([_UNPACK[b] for b in self.packed])[:self.length]
+        if self.n_mask:
+            mask = int.from_bytes(self.n_mask, 'little')
+            sequence = ''.join('N' if mask >> i & 1 else c for i, c in enumerate(sequence))
+        return sequence
+
+    def base_counts(self):
+        """Counts A, C, G, T and N in the sequence without decoding it
+
+        >>> NodePacked('CGGCGNCGGA', None).base_counts()
+        (1, 3, 5, 0, 1)
+        """
+        packed = self.packed
+        num_n = sum(self.n_mask.translate(_COUNT_BITS)) if self.n_mask else 0
+        # the unused bits of the last byte are zeros, the same as A
+        padding = -self.length % 4
+        return (
+            sum(packed.translate(_COUNT_A)) - padding - num_n,
+            sum(packed.translate(_COUNT_C)),
+            sum(packed.translate(_COUNT_G)),
+            sum(packed.translate(_COUNT_T)),
+            num_n)
+
+    def first(self):
+        """The first base of the sequence"""
+        if self.n_mask and self.n_mask[0] & 1:
+            return 'N'
+        return 'ACGT'[self.packed[0] & 3]
+
 def _lazy_convert_and_increment_terminal(n):
     """Ensures the node is a class that can track count and increments the count
 
@@ -106,25 +197,49 @@ def _lazy_convert_terminal(n):
     return n
 
 def _lazy_compress(n, sequence):
-    """Converts nodes with just one child to a compressed representation to save memory"""
+    """Converts nodes with just one child to a compressed representation to save memory
+
+    The non-branching path is followed with a loop instead of recursion so that very
+    long runs (e.g. thousands of CGG repeats) don't hit Python's recursion limit. An
+    existing `NodeCompressed` is extended if words added since made its end non-branching.
+    """
+    compressed = n if isinstance(n, NodeCompressed) else None
+    if compressed:
+        n = compressed.next
+    path = [sequence]
+
+    # only compress if there are no counts that'll be lost
+    while not isinstance(n, int) and not isinstance(n, NodeWithCount):
+        if n.A and not any((n.C, n.G, n.T, n.N)):
+            n = n.A
+            path.append('A')
+        elif n.C and not any((n.A, n.G, n.T, n.N)):
+            n = n.C
+            path.append('C')
+        elif n.G and not any((n.A, n.C, n.T, n.N)):
+            n = n.G
+            path.append('G')
+        elif n.T and not any((n.A, n.C, n.G, n.N)):
+            n = n.T
+            path.append('T')
+        elif n.N and not any((n.A, n.C, n.G, n.T)):
+            n = n.N
+            path.append('N')
+        else:
+            break
+
+    # nothing to add to an existing compressed path, keep it (and its packing) as-is
+    if compressed:
+        if len(path) == 1:
+            return compressed
+        path[0] = compressed.sequence
+    sequence = ''.join(path)
+
     if isinstance(n, int):
         if len(sequence) > 1:
             return NodeCompressed(sys.intern(sequence), n)
         return n
 
-    # only compress if there are no counts that'll be lost
-    if not isinstance(n, NodeWithCount):
-        if n.A and not any((n.C, n.G, n.T, n.N)):
-            return _lazy_compress(n.A, sequence + 'A')
-        if n.C and not any((n.A, n.G, n.T, n.N)):
-            return _lazy_compress(n.C, sequence + 'C')
-        if n.G and not any((n.A, n.C, n.T, n.N)):
-            return _lazy_compress(n.G, sequence + 'G')
-        if n.T and not any((n.A, n.C, n.G, n.N)):
-            return _lazy_compress(n.T, sequence + 'T')
-        if n.N and not any((n.A, n.C, n.G, n.T)):
-            return _lazy_compress(n.N, sequence + 'N')
-
     # if just one character, there is nothing to compress
     if len(sequence) == 1:
         return n
@@ -134,12 +249,16 @@ def _lazy_compress(n, sequence):
 def _compress(n):
     """Reduces non-branching multi-Node paths to single NodeCompressed instances
 
-    This method is intended to be run once after all words are added. It can save a
-    large amount of space by converting non-branching N-length sequences from (120 * N)
-    bytes to be <= (120 + N) bytes. These sequences can be anywhere in the graph.
+    This method is intended to be run after words are added. It can save a large amount
+    of space by converting non-branching N-length sequences from (120 * N) bytes to be
+    <= (120 + N) bytes. These sequences can be anywhere in the graph, including under a
+    NodeWithCount. It is safe to run again after more words are added to a compressed
+    trie (see `add_word`).
     """
     if not n:
         return
+    if isinstance(n, NodeRoot):
+        n.subtree_counts = None
 
     # depth-first heap-based recursion is used here to avoid running out of memory
     nodes = deque((n.A, n.C, n.G, n.T, n.N))
@@ -148,33 +267,111 @@ def _compress(n):
         n = nodes.pop()
 
         # skip terminal markers
-        if not n:
-            continue;
-
-        if not isinstance(n, int):
-            if n.A and not isinstance(n.A, int) and not isinstance(n.A, NodeWithCount):
-                n.A = _lazy_compress(n.A, 'A')
-                nodes.append(n.A.next if isinstance(n.A, NodeCompressed) else n.A)
-            if n.C and not isinstance(n.C, int) and not isinstance(n.C, NodeWithCount):
-                n.C = _lazy_compress(n.C, 'C')
-                nodes.append(n.C.next if isinstance(n.C, NodeCompressed) else n.C)
-            if n.G and not isinstance(n.G, int) and not isinstance(n.G, NodeWithCount):
-                n.G = _lazy_compress(n.G, 'G')
-                nodes.append(n.G.next if isinstance(n.G, NodeCompressed) else n.G)
-            if n.T and not isinstance(n.T, int) and not isinstance(n.T, NodeWithCount):
-                n.T = _lazy_compress(n.T, 'T')
-                nodes.append(n.T.next if isinstance(n.T, NodeCompressed) else n.T)
-            if n.N and not isinstance(n.N, int) and not isinstance(n.N, NodeWithCount):
-                n.N = _lazy_compress(n.N, 'N')
-                nodes.append(n.N.next if isinstance(n.N, NodeCompressed) else n.N)
-
-
-def add_word(trie, word):
-    """Adds a word/sequence to the given trie"""
+        if not n or isinstance(n, int):
+            continue
+        if isinstance(n, NodeCompressed):
+            nodes.append(n.next)
+            continue
+
+        if n.A and not isinstance(n.A, int):
+            n.A = _lazy_compress(n.A, 'A')
+            nodes.append(n.A.next if isinstance(n.A, NodeCompressed) else n.A)
+        if n.C and not isinstance(n.C, int):
+            n.C = _lazy_compress(n.C, 'C')
+            nodes.append(n.C.next if isinstance(n.C, NodeCompressed) else n.C)
+        if n.G and not isinstance(n.G, int):
+            n.G = _lazy_compress(n.G, 'G')
+            nodes.append(n.G.next if isinstance(n.G, NodeCompressed) else n.G)
+        if n.T and not isinstance(n.T, int):
+            n.T = _lazy_compress(n.T, 'T')
+            nodes.append(n.T.next if isinstance(n.T, NodeCompressed) else n.T)
+        if n.N and not isinstance(n.N, int):
+            n.N = _lazy_compress(n.N, 'N')
+            nodes.append(n.N.next if isinstance(n.N, NodeCompressed) else n.N)
+
+def _add_to_compressed(n, word, i):
+    """Follows `word[i:]` along the NodeCompressed `n`, splitting it if the word leaves it
+
+    `n.sequence[0] == word[i]` is the character of the edge that leads to `n`. Each
+    character of `n.sequence` stands for one (non-branching) Node and `n.next` is the
+    Node of the last character.
+
+    Returns a tuple of what should replace `n` in its parent, the node to keep adding
+    the word from (None if the word was used up) and the index of the next character.
+    """
+    seq = n.sequence
+
+    # find how much of the compressed path the word shares
+    if word.startswith(seq, i):
+        shared = len(seq)
+    else:
+        shared = 1
+        end = min(len(seq), len(word) - i)
+        while shared < end and seq[shared] == word[i + shared]:
+            shared += 1
+    i += shared
+
+    # the whole path matched, continue past it or end on its last node
+    if shared == len(seq):
+        if i == len(word):
+            n.next = _lazy_convert_and_increment_terminal(n.next)
+            return n, None, i
+        n.next = _lazy_convert_terminal(n.next)
+        return n, n.next, i
+
+    # split the path in two around a node where the word ends or branches off
+    rest = seq[shared:]
+    tail = NodeCompressed(sys.intern(rest), n.next) if len(rest) > 1 else n.next
+    if i == len(word):
+        split = NodeWithCount(count=1)
+    else:
+        split = Node()
+    setattr(split, rest[0], tail)
+    head = NodeCompressed(sys.intern(seq[:shared]), split) if shared > 1 else split
+    return head, split if i < len(word) else None, i
+
+def add_word(trie, word, compress=False):
+    """Adds a word/sequence to the given trie
+
+    Words can be added after `_compress` has been run. `NodeCompressed` paths are
+    followed and split where the word ends or branches off of them. If `compress` is
+    True, a new non-branching tail is added as one `NodeCompressed` instead of one Node
+    per character so that a compressed trie stays compressed while words stream in.
+
+    >>> words = ['CGGCGGA', 'CGGCGGC', 'CGGCGGA', 'CGGCG', 'CGGCGGCTT', 'CGAT', 'CGGCGGCAAAA', 'C']
+    >>> trie = make_trie(words[:2])
+    >>> for word in words[2:]:
+    ...     add_word(trie, word, compress=True)
+    >>> tally_iterative(trie) == tally_iterative(make_trie(words, compress=False))
+    True
+    """
+    # keep the per-character totals up to date if this is the root made by `make_trie`
+    if isinstance(trie, NodeRoot):
+        trie.subtree_counts = None
+        trie.num_a += word.count('A')
+        trie.num_c += word.count('C')
+        trie.num_g += word.count('G')
+        trie.num_t += word.count('T')
+        trie.num_n += word.count('N')
+
     # start at the root node and add each letter
     n = trie
-    for i in range(len(word)):
+    i = 0
+    while i < len(word):
         c = word[i]
+        child = getattr(n, c)
+
+        # follow (or split) a compressed path, it may cover many characters at once
+        if isinstance(child, NodeCompressed):
+            child, next_node, i = _add_to_compressed(child, word, i)
+            setattr(n, c, child)
+            n = next_node
+            continue
+
+        # the rest of the word is a new non-branching path
+        if compress and not child and len(word) - i > 1:
+            setattr(n, c, NodeCompressed(sys.intern(word[i:]), 1))
+            break
 
         # if last character, use a terminal marker (an `int` of the count) to save space
         if i == len(word) - 1:
@@ -206,20 +403,134 @@ def add_word(trie, word):
         if c == 'N':
             n.N = _lazy_convert_terminal(n.N)
             n = n.N
+        i += 1
+
+def _pack(n, min_length=32):
+    """Replaces NodeCompressed paths of at least `min_length` bases with NodePacked
+
+    Short sequences are left alone since `sys.intern` can share them across the trie and
+    the bytes object of a NodePacked has more fixed overhead than the bases it saves.
+    """
+    if isinstance(n, NodeRoot):
+        n.subtree_counts = None
 
-def make_trie(words, compress=True):
+    nodes = [n]
+    while nodes:
+        n = nodes.pop()
+        if not n or isinstance(n, int):
+            continue
+        if isinstance(n, NodeCompressed):
+            nodes.append(n.next)
+            continue
+
+        if isinstance(n.A, NodeCompressed) and not isinstance(n.A, NodePacked) and len(n.A.sequence) >= min_length:
+            n.A = NodePacked(n.A.sequence, n.A.next)
+        if isinstance(n.C, NodeCompressed) and not isinstance(n.C, NodePacked) and len(n.C.sequence) >= min_length:
+            n.C = NodePacked(n.C.sequence, n.C.next)
+        if isinstance(n.G, NodeCompressed) and not isinstance(n.G, NodePacked) and len(n.G.sequence) >= min_length:
+            n.G = NodePacked(n.G.sequence, n.G.next)
+        if isinstance(n.T, NodeCompressed) and not isinstance(n.T, NodePacked) and len(n.T.sequence) >= min_length:
+            n.T = NodePacked(n.T.sequence, n.T.next)
+        if isinstance(n.N, NodeCompressed) and not isinstance(n.N, NodePacked) and len(n.N.sequence) >= min_length:
+            n.N = NodePacked(n.N.sequence, n.N.next)
+        nodes.extend((n.A, n.C, n.G, n.T, n.N))
+
+def make_trie(words, compress=True, packed=False):
     """Create a trie from the given words (DNA sequences)
 
     It is assumed that each word consists of only A, C, G, T and N. No error handling
-    for case sensitivity or unexpected characters is done.
+    for case sensitivity or unexpected characters is done. `packed` stores long
+    compressed paths 2 bits per base, see NodePacked.
+
+    >>> words = ['CGG' * 20 + 'A', 'CGG' * 20 + 'NNC', 'CGG' * 30]
+    >>> trie = make_trie(words, packed=True)
+    >>> isinstance(trie.C.G, NodePacked), trie.C.G.sequence == ('CGG' * 20)[1:]
+    (True, True)
+    >>> tally_iterative(trie) == tally_iterative(make_trie(words, compress=False))
+    True
+    >>> add_word(trie, 'CGG' * 10 + 'T')
+    >>> tally_iterative(trie) == tally_iterative(make_trie(words + ['CGG' * 10 + 'T']))
+    True
     """
-    n = Node()
+    n = NodeRoot()
     for word in words:
         add_word(n, word)
     if compress:
         _compress(n)
+        if packed:
+            _pack(n)
     return n
 
+def _expand(n):
+    """Returns a Node or NodeWithCount equivalent to `n` with its first character explicit
+
+    A terminal marker becomes a NodeWithCount and a NodeCompressed gives up its first
+    character to a Node whose only child is the rest of the compressed path.
+    """
+    if isinstance(n, int):
+        return NodeWithCount(count=n)
+    if isinstance(n, NodeCompressed):
+        rest = n.sequence[1:]
+        node = Node()
+        setattr(node, rest[0], NodeCompressed(sys.intern(rest), n.next) if len(rest) > 1 else n.next)
+        return node
+    return n
+
+def merge(trie, other, compress=True):
+    """Merges the words of `other` in to `trie`, e.g. to combine tries of different batches
+
+    Subtrees that only exist in `other` are moved in to `trie` as-is, so `other` should
+    not be used afterwards. Compressed paths that both tries share are expanded one
+    character at a time while merging and `trie` is re-compressed at the end.
+
+    >>> trie = merge(make_trie(['CGGCGGA', 'ACGT', 'C']), make_trie(['CGGCGGAT', 'CGGT', 'ACGT', 'T']))
+    >>> tally_iterative(trie) == tally_iterative(make_trie(['CGGCGGA', 'ACGT', 'C', 'CGGCGGAT', 'CGGT', 'ACGT', 'T']))
+    True
+    >>> calculate_fraction(trie, {'T'})
+    0.1724137931034483
+    """
+    # keep the running totals of the root correct
+    if isinstance(trie, NodeRoot):
+        trie.subtree_counts = None
+        if isinstance(other, NodeRoot):
+            num_a, num_c, num_g, num_t, num_n = other.num_a, other.num_c, other.num_g, other.num_t, other.num_n
+        else:
+            num_a, num_c, num_g, num_t, num_n = tally_iterative(other)
+        trie.num_a += num_a
+        trie.num_c += num_c
+        trie.num_g += num_g
+        trie.num_t += num_t
+        trie.num_n += num_n
+
+    # depth-first pairs of nodes from each trie that represent the same prefix
+    nodes = [(trie, other)]
+    while nodes:
+        a, b = nodes.pop()
+        for c in 'ACGTN':
+            child_b = getattr(b, c)
+            if not child_b:
+                continue
+            child_a = getattr(a, c)
+            if not child_a:
+                setattr(a, c, child_b)
+                continue
+            if isinstance(child_a, int) and isinstance(child_b, int):
+                setattr(a, c, child_a + child_b)
+                continue
+
+            child_a = _expand(child_a)
+            child_b = _expand(child_b)
+            if isinstance(child_b, NodeWithCount):
+                if not isinstance(child_a, NodeWithCount):
+                    child_a = NodeWithCount(child_a.A, child_a.C, child_a.G, child_a.T, child_a.N)
+                child_a.count += child_b.count
+            setattr(a, c, child_a)
+            nodes.append((child_a, child_b))
+
+    if compress:
+        _compress(trie)
+    return trie
+
 def tally(n, num_a=0, num_c=0, num_g=0, num_t=0, num_n=0):
     """Tallies the frequency of A, C, G, T and N via depth-first stack-based recursion"""
     # tally how many observations of prefixes up until now using NodeWithCount or terminal marker (an int)
@@ -259,6 +570,194 @@ def tally(n, num_a=0, num_c=0, num_g=0, num_t=0, num_n=0):
 
     return tallies
 
+def tally_iterative(trie):
+    """Tallies the frequency of A, C, G, T and N via an explicit depth-first stack
+
+    Same totals as `tally` but without recursion, so deep tries can't hit Python's
+    recursion limit, and without chaining a `map`/`zip` generator per node. Each stack
+    entry is a node plus how many of each character are on the path to it. Counts are
+    accumulated in five plain ints. `NodeCompressed` sequences are counted with
+    `str.count` instead of looping over every character.
+
+    >>> tally_iterative(make_trie(['ACTG', 'AACT', 'TCAGG', 'TTGGA']))
+    (5, 3, 5, 5, 0)
+    >>> tally_iterative(make_trie(['G', 'GGG', 'GGAC'], compress=False))
+    (1, 1, 6, 0, 0)
+    >>> tally_iterative(make_trie(['C' * 5000]))
+    (0, 5000, 0, 0, 0)
+    """
+    num_a = num_c = num_g = num_t = num_n = 0
+    stack = [(trie, 0, 0, 0, 0, 0)]
+    while stack:
+        node, a, c, g, t, n = stack.pop()
+
+        # terminal marker (an int) is just a count with no children
+        if isinstance(node, int):
+            count = node
+        # the first character of a compressed sequence was already counted by its parent
+        elif isinstance(node, NodePacked):
+            num = list(node.base_counts())
+            num['ACGTN'.index(node.first())] -= 1
+            stack.append((node.next, a + num[0], c + num[1], g + num[2], t + num[3], n + num[4]))
+            continue
+        elif isinstance(node, NodeCompressed):
+            seq = node.sequence
+            stack.append((
+                node.next,
+                a + seq.count('A', 1),
+                c + seq.count('C', 1),
+                g + seq.count('G', 1),
+                t + seq.count('T', 1),
+                n + seq.count('N', 1)))
+            continue
+        else:
+            count = node.count if isinstance(node, NodeWithCount) else 0
+            if node.A:
+                stack.append((node.A, a + 1, c, g, t, n))
+            if node.C:
+                stack.append((node.C, a, c + 1, g, t, n))
+            if node.G:
+                stack.append((node.G, a, c, g + 1, t, n))
+            if node.T:
+                stack.append((node.T, a, c, g, t + 1, n))
+            if node.N:
+                stack.append((node.N, a, c, g, t, n + 1))
+
+        if count:
+            num_a += a * count
+            num_c += c * count
+            num_g += g * count
+            num_t += t * count
+            num_n += n * count
+
+    return num_a, num_c, num_g, num_t, num_n
+
+
+def _find_prefix(trie, prefix):
+    """Finds the node under which every sequence starting with `prefix` ends
+
+    Returns the node and the characters leading to it, which are longer than `prefix`
+    if it ends part way through a NodeCompressed path. Returns (None, None) if no
+    sequence starts with `prefix`.
+    """
+    n = trie
+    i = 0
+    while i < len(prefix):
+        if isinstance(n, int):
+            return None, None
+        child = getattr(n, prefix[i])
+        if not child:
+            return None, None
+
+        # a compressed path either contains the rest of the prefix, covers part of it or differs
+        if isinstance(child, NodeCompressed):
+            seq = child.sequence
+            if prefix.startswith(seq, i):
+                n = child.next
+                i += len(seq)
+            elif seq.startswith(prefix[i:]):
+                return child.next, prefix[:i] + seq
+            else:
+                return None, None
+        else:
+            n = child
+            i += 1
+    return n, prefix
+
+def _count_below(n, cache=None):
+    """Counts sequences ending on or under `n`, caching the count of every node visited
+
+    Children are counted before their parents via an explicit post-order stack. Terminal
+    markers are their own count and aren't cached.
+    """
+    if isinstance(n, int):
+        return n
+    if cache is not None and id(n) in cache:
+        return cache[id(n)]
+
+    counts = {} if cache is None else cache
+    stack = [(n, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if isinstance(node, NodeCompressed):
+            children = (node.next,)
+        else:
+            children = (node.A, node.C, node.G, node.T, node.N)
+
+        if not children_done:
+            stack.append((node, True))
+            for child in children:
+                if child and not isinstance(child, int) and id(child) not in counts:
+                    stack.append((child, False))
+            continue
+
+        total = node.count if isinstance(node, NodeWithCount) else 0
+        for child in children:
+            if child:
+                total += child if isinstance(child, int) else counts[id(child)]
+        counts[id(node)] = total
+    return counts[id(n)]
+
+def count_prefix(trie, prefix):
+    """Counts how many sequences start with `prefix`
+
+    The first query under a node walks its whole subtree, O(len(prefix) + subtree). The
+    count of every node walked is cached in `NodeRoot.subtree_counts`, so later queries
+    are O(len(prefix)) until the trie changes. `add_word`, `merge` and `_compress` clear
+    the cache, so interleaving adds and queries re-walks subtrees every time. The cache
+    grows to O(nodes) memory once the whole trie has been counted, e.g. by `prefix=''`.
+
+    >>> trie = make_trie(['CGGCGGA', 'CGGCGGC', 'CGGCGGA', 'CGAT', 'ACGT', 'A'])
+    >>> [count_prefix(trie, p) for p in ('', 'A', 'C', 'CGG', 'CGGCGGA', 'CGGCGGAT', 'T')]
+    [6, 2, 4, 3, 2, 0, 0]
+    >>> add_word(trie, 'CGGT')
+    >>> count_prefix(trie, 'CGG')
+    4
+    """
+    n, _ = _find_prefix(trie, prefix)
+    if n is None:
+        return 0
+
+    if isinstance(trie, NodeRoot):
+        if trie.subtree_counts is None:
+            trie.subtree_counts = {}
+        return _count_below(n, trie.subtree_counts)
+    return _count_below(n)
+
+def words_with_prefix(trie, prefix):
+    """Yields each distinct sequence starting with `prefix` and how many times it was added
+
+    >>> sorted(words_with_prefix(make_trie(['CGGCGGA', 'CGGCGGC', 'CGGCGGA', 'CGAT', 'ACGT']), 'CGG'))
+    [('CGGCGGA', 2), ('CGGCGGC', 1)]
+    """
+    n, path = _find_prefix(trie, prefix)
+    if n is None:
+        return
+
+    # depth-first, each entry is a node and the characters leading to it
+    nodes = [(n, path)]
+    while nodes:
+        n, path = nodes.pop()
+        if isinstance(n, int):
+            yield path, n
+            continue
+        if isinstance(n, NodeCompressed):
+            nodes.append((n.next, path + n.sequence[1:]))
+            continue
+
+        if isinstance(n, NodeWithCount) and n.count:
+            yield path, n.count
+        if n.N:
+            nodes.append((n.N, path + 'N'))
+        if n.T:
+            nodes.append((n.T, path + 'T'))
+        if n.G:
+            nodes.append((n.G, path + 'G'))
+        if n.C:
+            nodes.append((n.C, path + 'C'))
+        if n.A:
+            nodes.append((n.A, path + 'A'))
+
 
 def calculate_fraction(trie, characters):
     """
@@ -293,9 +792,20 @@ def calculate_fraction(trie, characters):
     # manually calculated test case #3 with 32/35 being C's or G' checing "compression" logic via FragileX repeats
     >>> calculate_fraction(make_trie(['CGGCGGA', 'CGGCGGC', 'CGGCGGG', 'CGGCGGT', 'CGGCGGN']), {'C', 'G'})
     0.9142857142857143
+
+    # running totals survive compression and words added afterwards
+    >>> trie = make_trie(['CGGCGGA', 'CGGCGGC'])
+    >>> add_word(trie, 'TTTT')
+    >>> calculate_fraction(trie, {'T'}) == calculate_fraction(make_trie(['CGGCGGA', 'CGGCGGC', 'TTTT']), {'T'})
+    True
+    >>> (trie.num_a, trie.num_c, trie.num_g, trie.num_t, trie.num_n) == tally_iterative(trie)
+    True
     """
-    # total of each character based on iterating through the trie
-    num_a, num_c, num_g, num_t, num_n = tally(trie)
+    # the root from `make_trie` has running totals, otherwise iterate through the trie
+    if isinstance(trie, NodeRoot):
+        num_a, num_c, num_g, num_t, num_n = trie.num_a, trie.num_c, trie.num_g, trie.num_t, trie.num_n
+    else:
+        num_a, num_c, num_g, num_t, num_n = tally_iterative(trie)
 
     numerator = sum(
         [x if y in characters else 0
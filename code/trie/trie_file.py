@@ -0,0 +1,239 @@
+"""
+Compact binary file format for trie_dna_optimized tries that can be queried via `mmap`
+
+Building a trie from raw reads can take minutes. `dump` writes a built (and ideally
+compressed) trie to disk once and `open_trie` maps the file back in without creating a
+Python object per node. `calculate_fraction` and `count_prefix` work directly against
+the mapped bytes and `load` turns the file back in to regular trie_dna_optimized objects.
+
+File layout, all little-endian:
+
+0. Header: magic, number of node records, number of strings and the five running
+   character totals of the root.
+
+1. Node records. Each is seven uint32: kind, value and five child slots.
+
+   a. NODE records are `Node`, `NodeWithCount` and terminal markers (an int). `value`
+      is the count and the slots are the record index of the A, C, G, T and N children
+      or 0 if there is no child. 0 is safe since it is the root's index.
+
+   b. COMPRESSED records are `NodeCompressed`. `value` is the index of its sequence in
+      the string table and the first slot is the record index of `next`.
+
+2. String table. uint64 offsets followed by one blob of all `NodeCompressed` sequences.
+   Sequences are deduplicated, same as `sys.intern` does in memory.
+
+Records are written parent first, so every child has a larger index than its parent.
+"""
+import mmap
+import struct
+import sys
+from array import array
+
+import trie_dna_optimized
+from trie_dna_optimized import Node, NodeWithCount, NodeCompressed, NodeRoot
+
+
+MAGIC = b'DNATRIE1'
+HEADER = struct.Struct('<8sIIQQQQQ')
+RECORD_SIZE = 7
+
+NODE = 0
+COMPRESSED = 1
+
+BASES = 'ACGTN'
+
+
+def _little_endian(a):
+    """Arrays are written and read in the machine's byte order, files are little-endian"""
+    if sys.byteorder != 'little':
+        a.byteswap()
+    return a
+
+def dump(trie, path):
+    """Writes the trie to `path` in the binary format described above
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'example.trie')
+    >>> dump(trie_dna_optimized.make_trie(['CGGCGGA', 'CGGCGGC', 'ACGT', 'A']), path)
+    >>> mapped = open_trie(path)
+    >>> len(mapped)
+    9
+    >>> calculate_fraction(mapped, {'C', 'G'})
+    0.7894736842105263
+    >>> count_prefix(mapped, 'CGGC'), count_prefix(mapped, 'A'), count_prefix(mapped, 'AT')
+    (2, 2, 0)
+    >>> trie_dna_optimized.tally_iterative(load(path))
+    (3, 6, 9, 1, 0)
+    >>> mapped.close()
+    """
+    records = array('I', [0] * RECORD_SIZE)
+    strings = {}
+
+    # depth-first, each entry is a node and the index of its already allocated record
+    nodes = [(trie, 0)]
+    while nodes:
+        n, index = nodes.pop()
+        offset = index * RECORD_SIZE
+
+        if isinstance(n, int):
+            records[offset] = NODE
+            records[offset + 1] = n
+            continue
+
+        if isinstance(n, NodeCompressed):
+            records[offset] = COMPRESSED
+            records[offset + 1] = strings.setdefault(n.sequence, len(strings))
+            children = (n.next,)
+        else:
+            records[offset] = NODE
+            records[offset + 1] = n.count if isinstance(n, NodeWithCount) else 0
+            children = (n.A, n.C, n.G, n.T, n.N)
+
+        for slot, child in enumerate(children):
+            if child:
+                records[offset + 2 + slot] = len(records) // RECORD_SIZE
+                records.extend((0,) * RECORD_SIZE)
+                nodes.append((child, records[offset + 2 + slot]))
+
+    if isinstance(trie, NodeRoot):
+        totals = (trie.num_a, trie.num_c, trie.num_g, trie.num_t, trie.num_n)
+    else:
+        totals = trie_dna_optimized.tally_iterative(trie)
+
+    # strings are numbered in the order they were first seen, dicts keep that order
+    blob = ''.join(strings).encode('ascii')
+    offsets = array('Q', [0])
+    for sequence in strings:
+        offsets.append(offsets[-1] + len(sequence))
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(records) // RECORD_SIZE, len(strings), *totals))
+        _little_endian(records).tofile(f)
+        # keep the uint64 offsets 8 byte aligned
+        f.write(b'\0' * (-f.tell() % 8))
+        _little_endian(offsets).tofile(f)
+        f.write(blob)
+
+
+class MappedTrie:
+    """Read-only view of a trie file. Records and strings are read from the `mmap`"""
+    __slots__ = 'file', 'mmap', 'records', 'offsets', 'blob', 'totals'
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, num_records, num_strings, *totals = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a trie file')
+        if sys.byteorder != 'little':
+            raise ValueError('Mapping trie files is only supported on little-endian machines')
+        self.totals = tuple(totals)
+
+        view = memoryview(self.mmap)
+        start = HEADER.size
+        end = start + num_records * RECORD_SIZE * 4
+        self.records = view[start:end].cast('I')
+        start = end + (-end % 8)
+        end = start + (num_strings + 1) * 8
+        self.offsets = view[start:end].cast('Q')
+        self.blob = view[end:]
+
+    def __len__(self):
+        """Number of node records, including the root"""
+        return len(self.records) // RECORD_SIZE
+
+    def sequence(self, string_id):
+        """Returns the `NodeCompressed` sequence with the given index in the string table"""
+        return bytes(self.blob[self.offsets[string_id]:self.offsets[string_id + 1]]).decode('ascii')
+
+    def close(self):
+        for view in (self.records, self.offsets, self.blob):
+            view.release()
+        self.mmap.close()
+        self.file.close()
+
+
+def open_trie(path):
+    """Memory maps a file written by `dump` for querying without loading every node"""
+    return MappedTrie(path)
+
+def _count_below(mapped, index):
+    """Counts how many sequences end on or under the record at `index`"""
+    records = mapped.records
+    total = 0
+    stack = [index]
+    while stack:
+        offset = stack.pop() * RECORD_SIZE
+        if records[offset] == COMPRESSED:
+            stack.append(records[offset + 2])
+            continue
+        total += records[offset + 1]
+        for child in records[offset + 2:offset + RECORD_SIZE]:
+            if child:
+                stack.append(child)
+    return total
+
+def count_prefix(mapped, prefix):
+    """Counts how many sequences in the mapped trie start with `prefix`"""
+    records = mapped.records
+    index = 0
+    i = 0
+    while i < len(prefix):
+        child = records[index * RECORD_SIZE + 2 + BASES.index(prefix[i])]
+        if not child:
+            return 0
+
+        # a compressed path either contains the rest of the prefix, covers part of it or differs
+        offset = child * RECORD_SIZE
+        if records[offset] == COMPRESSED:
+            sequence = mapped.sequence(records[offset + 1])
+            rest = prefix[i:]
+            if sequence.startswith(rest):
+                return _count_below(mapped, records[offset + 2])
+            if not rest.startswith(sequence):
+                return 0
+            child = records[offset + 2]
+            i += len(sequence)
+        else:
+            i += 1
+        index = child
+    return _count_below(mapped, index)
+
+def calculate_fraction(mapped, characters):
+    """Same as `trie_dna_optimized.calculate_fraction` using the totals in the file header"""
+    numerator = sum(x for x, y in zip(mapped.totals, BASES) if y in characters)
+    denominator = sum(mapped.totals)
+
+    # return the fraction and protected against divide-by-zero
+    if not denominator:
+        raise ValueError("Can not estimate frequency if no sequences are provided")
+
+    return numerator / denominator
+
+def load(path):
+    """Reads a file written by `dump` back in to trie_dna_optimized objects"""
+    mapped = open_trie(path)
+    records = mapped.records
+
+    # children always have larger indexes, so build from the last record to the first
+    nodes = [None] * len(mapped)
+    for index in range(len(mapped) - 1, 0, -1):
+        offset = index * RECORD_SIZE
+        if records[offset] == COMPRESSED:
+            nodes[index] = NodeCompressed(
+                sys.intern(mapped.sequence(records[offset + 1])), nodes[records[offset + 2]])
+            continue
+
+        count = records[offset + 1]
+        children = [nodes[child] if child else None for child in records[offset + 2:offset + RECORD_SIZE]]
+        if not any(children):
+            nodes[index] = count
+        elif count:
+            nodes[index] = NodeWithCount(*children, count=count)
+        else:
+            nodes[index] = Node(*children)
+
+    trie = NodeRoot(*[nodes[child] if child else None for child in records[2:RECORD_SIZE]])
+    trie.num_a, trie.num_c, trie.num_g, trie.num_t, trie.num_n = mapped.totals
+    mapped.close()
+    return trie
@@ -0,0 +1,97 @@
+"""
+Builds a trie_dna_optimized trie on many cores by sharding reads on their first bases
+
+The subtries under the root's A, C, G, T and N children are independent of each other.
+Reads are partitioned by their first `prefix_length` (1-3) bases, a process pool builds
+one compressed subtrie per shard with `trie_dna_optimized.make_trie` and the results are
+combined under one root with `trie_dna_optimized.merge`. Subtries are always sent back
+compressed, an uncompressed path of a long read would nest one object per base and is
+too deep to pickle.
+
+Two shards only share a prefix shorter than `prefix_length`, and it ends where their
+next bases differ or one of them has a read that ends. Merging them only expands the
+top few levels of the trie and leaves nothing to re-compress, so the result is the
+same trie that `trie_dna_optimized.make_trie` builds on one core.
+
+Run with `python trie_parallel.py` to compare against a single core build.
+"""
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import trie_dna_optimized
+
+
+def _shard(words, prefix_length):
+    """Partitions words by their first `prefix_length` characters
+
+    >>> sorted(_shard(['ACGT', 'ACCA', 'GT', 'A'], 2).items())
+    [('A', ['A']), ('AC', ['ACGT', 'ACCA']), ('GT', ['GT'])]
+    """
+    shards = defaultdict(list)
+    for word in words:
+        shards[word[:prefix_length]].append(word)
+    return shards
+
+def _make_shard(words):
+    """Builds the compressed trie of one shard in a worker process"""
+    return trie_dna_optimized.make_trie(words)
+
+def make_trie(words, compress=True, prefix_length=1, processes=None):
+    """Same as `trie_dna_optimized.make_trie` but builds shards of the trie in parallel
+
+    `processes` defaults to the number of CPUs, same as ProcessPoolExecutor. Only
+    compressed tries can be built, see above.
+
+    >>> words = ['CGGCGGA', 'CGGCGGC', 'ACGT', 'TTGGA', 'CGAT', 'ACGT', 'N']
+    >>> trie = make_trie(words, prefix_length=2, processes=2)
+    >>> trie_dna_optimized.tally_iterative(trie) == trie_dna_optimized.tally_iterative(trie_dna_optimized.make_trie(words))
+    True
+    >>> trie_dna_optimized.calculate_fraction(trie, {'C', 'G'})
+    0.65625
+    >>> make_trie(words, prefix_length=4)
+    Traceback (most recent call last):
+    ...
+    ValueError: prefix_length must be 1, 2 or 3, not 4
+    >>> make_trie(words, compress=False)
+    Traceback (most recent call last):
+    ...
+    ValueError: Parallel builds are always compressed, use trie_dna_optimized.make_trie(words, compress=False)
+    """
+    if prefix_length not in (1, 2, 3):
+        raise ValueError(f'prefix_length must be 1, 2 or 3, not {prefix_length}')
+    if not compress:
+        raise ValueError('Parallel builds are always compressed, use trie_dna_optimized.make_trie(words, compress=False)')
+    shards = _shard(words, prefix_length)
+
+    trie = trie_dna_optimized.make_trie([])
+    with ProcessPoolExecutor(processes) as pool:
+        for shard in pool.map(_make_shard, shards.values()):
+            trie_dna_optimized.merge(trie, shard, compress=False)
+    return trie
+
+
+if __name__ == '__main__':
+    random.seed(0)
+    reads = [''.join(random.choice('ACGT') for x in range(100)) for x in range(50000)]
+
+    start = time.perf_counter()
+    serial = trie_dna_optimized.make_trie(reads)
+    serial_seconds = time.perf_counter() - start
+
+    results = []
+    for prefix_length in (1, 2, 3):
+        start = time.perf_counter()
+        parallel = make_trie(reads, prefix_length=prefix_length)
+        results.append((prefix_length, time.perf_counter() - start))
+        assert trie_dna_optimized.tally_iterative(parallel) == trie_dna_optimized.tally_iterative(serial)
+
+    print(f"""
+Build Time for {len(reads)} Random 100bp Reads ({os.cpu_count()} CPUs)
+
+* Single core (trie_dna_optimized.py) = {serial_seconds:.2f} s
+""" + '\n'.join(
+        f'* Parallel, {p} base prefix (trie_parallel.py) = {s:.2f} s ({serial_seconds / s:.1f}x)'
+        for p, s in results))